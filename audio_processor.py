@@ -1,39 +1,393 @@
+import os
+import sqlite3
 import subprocess
 import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config import WHISPER_CLI, WHISPER_MODEL
+from typing import Dict, List, Optional, Union
+from config import (
+    SEARCH_INDEX_ENABLED, STREAM_DECODE, TRANSCRIPT_CACHE_ENABLED,
+    VAD_ENABLED, VAD_THRESHOLD_DB, VAD_MIN_SILENCE_MS, VAD_PADDING_MS,
+    LONG_FILE_ENABLED, LONG_FILE_SECONDS, CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS, CHUNK_WORKERS,
+    TIERED_ENABLED, TIER_FAST_MODEL, TIER_CONFIDENCE_THRESHOLD, TIER_FILE_FRACTION
+)
+from backends import TranscriptionBackend, get_backend, get_model_backend, resolve_model
+from governor import admitted
+from media_probe import is_whisper_ready, probe
 from subtitle_checker import handle_existing_subtitles
+from subtitle_writer import normalize_formats, subtitle_path, write_subtitle
+from metrics import get_metrics
+from process_runner import PIPE, Cancelled, get_runner
+from progress import ffmpeg_progress
+from transcript_cache import get_cache
 
-def convert_mp3_to_wav(mp3_path: Path, wav_path: Path) -> bool:
-    """Convert MP3 file to WAV format suitable for whisper."""
-    print("\n🎙️ Converting MP3 to WAV...")
-    
-    ffmpeg_cmd = [
+# Fast model for tiered transcription, or None to use only the configured model
+_fast_model = TIER_FAST_MODEL if TIERED_ENABLED else None
+
+def configure_tiering(fast_model: Optional[str]):
+    """Transcribe with fast_model first and the configured model only where confidence is low."""
+    global _fast_model
+    _fast_model = fast_model
+
+def ffmpeg_decode_command(mp3_path: Path, output: str) -> List[str]:
+    """Build the ffmpeg command that decodes audio to 16 kHz mono WAV."""
+    return [
         "ffmpeg",
         "-y",
         "-i", str(mp3_path),
+        "-map", "0:a:0",  # Only the first audio stream: video, subtitles and cover art are never decoded
         "-ar", "16000",
         "-ac", "1",
         "-hide_banner",
         "-loglevel", "error",  # Show errors but not info
-        str(wav_path)
+        "-nostats",
+        "-progress", "pipe:2",  # Machine-readable progress on stderr
+        "-f", "wav",
+        output
     ]
+
+def decode_pcm(mp3_path: Path) -> Optional[bytes]:
+    """Decode audio to raw 16 kHz mono 16-bit PCM in memory."""
+    cmd = ffmpeg_decode_command(mp3_path, "pipe:1")
+    cmd[cmd.index("wav")] = "s16le"
     
     try:
-        subprocess.run(ffmpeg_cmd, check=True)
+        with get_metrics().stage('decode'), ffmpeg_progress(mp3_path.name) as on_stderr:
+            return get_runner().run(cmd, stdout=PIPE, on_stderr=on_stderr, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error decoding {mp3_path.name}: {e}")
+        return None
+    except subprocess.TimeoutExpired as e:
+        print(f"⏱️  Decoding {mp3_path.name} timed out after {e.timeout:.0f}s")
+        return None
+
+def probe_duration(mp3_path: Path) -> Optional[float]:
+    """Audio duration in seconds according to ffprobe (cached), or None if it can't be read."""
+    info = probe(mp3_path)
+    return info['duration'] if info else None
+
+def convert_mp3_to_wav(mp3_path: Path, wav_path: Path) -> bool:
+    """Convert an audio (or video) file to WAV format suitable for whisper."""
+    print(f"\n🎙️ Converting {mp3_path.name} to WAV...")
+    
+    try:
+        with get_metrics().stage('decode', file=mp3_path), ffmpeg_progress(mp3_path.name) as on_stderr:
+            get_runner().run(ffmpeg_decode_command(mp3_path, str(wav_path)), on_stderr=on_stderr, check=True)
         return True
     except subprocess.CalledProcessError as e:
-        print(f"❌ Error converting MP3 to WAV: {e}")
+        print(f"❌ Error converting {mp3_path.name} to WAV: {e}")
+        return False
+    except subprocess.TimeoutExpired as e:
+        print(f"⏱️  Converting {mp3_path.name} timed out after {e.timeout:.0f}s")
+        return False
+    except Cancelled:
+        return False
+
+def transcribe_wav(wav_path: Path, threads: Optional[int] = None,
+                   backend: Optional[TranscriptionBackend] = None) -> Optional[List[Dict]]:
+    """Transcribe a converted WAV with the configured backend (or the given one)."""
+    backend = backend or get_backend()
+    print(f"📢 Running {backend.name} backend on {wav_path.name}...\n")
+    return backend.transcribe(wav_path, threads)
+
+def stream_transcribe(mp3_path: Path, threads: Optional[int] = None):
+    """
+    Pipe ffmpeg's WAV output straight into the backend, without an intermediate file.
+    Returns (segments, piped); segments is None if transcription failed, and piped is
+    False if it failed because the backend can't read audio from a pipe.
+    """
+    backend = get_backend()
+    print(f"\n📢 Streaming {mp3_path.name} into {backend.name} backend...\n")
+    
+    runner = get_runner()
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, "rb") as audio:
+        # ffmpeg writes into the pipe; the parent's copy of the write end is closed once it started
+        try:
+            ffmpeg = runner.submit(ffmpeg_decode_command(mp3_path, "pipe:1"), stdout=write_fd,
+                                   after_spawn=lambda: os.close(write_fd))
+        except Cancelled:
+            os.close(write_fd)
+            raise
+        try:
+            segments = backend.transcribe(audio, threads)
+        finally:
+            audio.close()  # Let ffmpeg see a broken pipe if the backend stopped reading
+            ffmpeg_result = runner.wait(ffmpeg)
+    
+    # Once the backend stopped reading, ffmpeg fails with a broken pipe, so its exit
+    # status only counts when it failed for another reason
+    decode_failed = ffmpeg_result.returncode != 0 and "Broken pipe" not in ffmpeg_result.stderr
+    if decode_failed:
+        print(ffmpeg_result.stderr[-2000:])
+        print(f"❌ Error converting {mp3_path.name} to WAV: ffmpeg exited with status {ffmpeg_result.returncode}")
+        return None, True
+    if segments is None:
+        return None, backend.probe_stdin()
+    if ffmpeg_result.returncode != 0:
+        print(f"❌ Error converting {mp3_path.name} to WAV: ffmpeg exited with status {ffmpeg_result.returncode}")
+        return None, True
+    return segments, True
+
+def transcribe_wav_bytes(wav_data: bytes, threads: Optional[int] = None,
+                         backend: Optional[TranscriptionBackend] = None) -> Optional[List[Dict]]:
+    """Transcribe in-memory WAV data, through a pipe if the backend supports it."""
+    backend = backend or get_backend()
+    if STREAM_DECODE and backend.stdin_supported is not False:
+        segments = backend.transcribe(wav_data, threads)
+        if segments is not None or backend.probe_stdin():
+            return segments  # Done, or failed for a reason a temporary file won't fix
+        print("↩️  Backend could not read from a pipe, falling back to a temporary WAV file")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wav_path = Path(tmpdir) / "speech.wav"
+        wav_path.write_bytes(wav_data)
+        return transcribe_wav(wav_path, threads, backend)
+
+def transcribe_long_audio(samples, threads: Optional[int] = None,
+                          backend: Optional[TranscriptionBackend] = None) -> Optional[List[Dict]]:
+    """Split long audio at quiet points and transcribe the overlapping chunks in parallel."""
+    import chunking
+    import vad
+    
+    chunks = chunking.plan_chunks(samples)
+    workers = min(CHUNK_WORKERS, len(chunks))
+    chunk_threads = max(1, (threads or os.cpu_count() or 1) // workers)
+    print(f"🧩 Long file: transcribing {len(chunks)} chunks with {workers} workers")
+    record = get_metrics().current()
+    
+    def transcribe_chunk(chunk):
+        audio_start, audio_end, _, _ = chunk
+        with get_metrics().attach(record):
+            return transcribe_wav_bytes(vad.encode_wav(samples[audio_start:audio_end]), chunk_threads, backend)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk_segments = list(executor.map(transcribe_chunk, chunks))
+    
+    if any(segments is None for segments in chunk_segments):
+        return None
+    return chunking.merge_chunks(chunks, chunk_segments)
+
+def transcribe_whole(samples, threads: Optional[int] = None,
+                     backend: Optional[TranscriptionBackend] = None) -> Optional[List[Dict]]:
+    """Transcribe in-memory 16 kHz samples with one model, chunking them if the audio is long."""
+    import vad
+    
+    if LONG_FILE_ENABLED and len(samples) > LONG_FILE_SECONDS * vad.SAMPLE_RATE:
+        return transcribe_long_audio(samples, threads, backend)
+    return transcribe_wav_bytes(vad.encode_wav(samples), threads, backend)
+
+def transcribe_tiered(samples, threads: Optional[int] = None) -> Optional[List[Dict]]:
+    """
+    Transcribe with the fast model, then re-run the low-confidence spans with the
+    configured model and merge them in. If most of the file is low-confidence,
+    the whole file is re-run instead.
+    """
+    import tiering
+    import vad
+    
+    fast_backend = get_model_backend(_fast_model)
+    segments = transcribe_whole(samples, threads, fast_backend)
+    if segments is None:
+        return None
+    
+    low = [segment for segment in segments if tiering.is_low_confidence(segment)]
+    if not low:
+        print(f"🚀 Fast model confident on all {len(segments)} segments")
+        return segments
+    
+    if len(low) > TIER_FILE_FRACTION * len(segments):
+        print(f"🔁 {len(low)} of {len(segments)} segments below confidence "
+              f"{TIER_CONFIDENCE_THRESHOLD}, re-running the whole file with the full model")
+        return transcribe_whole(samples, threads)
+    
+    duration_ms = len(samples) * 1000 // vad.SAMPLE_RATE
+    spans = tiering.low_confidence_spans(segments, duration_ms)
+    print(f"🔁 Re-running {len(low)} of {len(segments)} segments "
+          f"({len(spans)} spans) with the full model")
+    span_segments = []
+    for start, end in spans:
+        span_audio = samples[start * vad.SAMPLE_RATE // 1000:end * vad.SAMPLE_RATE // 1000]
+        refined = transcribe_wav_bytes(vad.encode_wav(span_audio), threads)
+        if refined is None:
+            return None
+        span_segments.append(refined)
+    return tiering.merge_refined(segments, spans, span_segments)
+
+def transcribe_samples(samples, threads: Optional[int] = None) -> Optional[List[Dict]]:
+    """Transcribe in-memory 16 kHz samples, tiered across models if enabled."""
+    if _fast_model is not None:
+        return transcribe_tiered(samples, threads)
+    return transcribe_whole(samples, threads)
+
+def transcribe_in_memory(mp3_path: Path, threads: Optional[int] = None,
+                         wav_path: Optional[Path] = None) -> Optional[List[Dict]]:
+    """
+    Transcribe from decoded samples held in memory. With VAD enabled only the regions
+    with voice activity are transcribed and the segment timestamps are mapped back
+    to the original timeline.
+    """
+    import vad
+    
+    samples = None
+    if wav_path is not None:
+        try:
+            samples = vad.read_wav(wav_path)
+        except wave.Error:
+            pass  # A WAV variant the wave module can't read: decode it with ffmpeg instead
+    if samples is None:
+        pcm = decode_pcm(mp3_path)
+        if pcm is None:
+            return None
+        samples = vad.pcm_to_samples(pcm)
+    get_metrics().set_audio_duration(len(samples) / vad.SAMPLE_RATE)
+    
+    if not VAD_ENABLED:
+        return transcribe_samples(samples, threads)
+    
+    with get_metrics().stage('vad'):
+        speech = vad.detect_speech(samples)
+        trimmed, regions = vad.trim_silence(samples, speech)
+    
+    total_seconds = len(samples) / vad.SAMPLE_RATE
+    skipped_seconds = total_seconds - len(trimmed) / vad.SAMPLE_RATE
+    skipped_fraction = skipped_seconds / total_seconds if total_seconds else 0.0
+    print(f"✂️  Voice activity: skipping {skipped_fraction:.1%} of the audio "
+          f"({skipped_seconds:.1f}s of {total_seconds:.1f}s)")
+    
+    if not speech:
+        return []
+    
+    segments = transcribe_samples(trimmed, threads)
+    if segments is None:
+        return None
+    return vad.remap_segments(segments, regions)
+
+def transcribe_mp3(mp3_path: Path, threads: Optional[int] = None,
+                   wav_path: Optional[Path] = None) -> Optional[List[Dict]]:
+    """
+    Transcribe an audio or video file into segments, once the resource governor
+    (if enabled) admits the job; it then also decides the thread count.
+    """
+    backend = get_backend()
+    with admitted(mp3_path.name, threads, backend.model if backend.name == 'cli' else None) as threads:
+        return _transcribe_mp3(mp3_path, threads, wav_path)
+
+def _transcribe_mp3(mp3_path: Path, threads: Optional[int] = None,
+                    wav_path: Optional[Path] = None) -> Optional[List[Dict]]:
+    """
+    Transcribe an audio or video file into segments.
+    Uses wav_path if it was already decoded, or the file itself if it already is a
+    16 kHz mono WAV. Otherwise streams the audio into the backend, or decodes to a
+    temporary WAV when streaming is disabled or not supported.
+    """
+    if wav_path is None:
+        info = probe(mp3_path)
+        if info is not None and info['audio'] is None:
+            print(f"❌ {mp3_path.name} has no audio stream")
+            return None
+        if is_whisper_ready(info):
+            print(f"⏩ {mp3_path.name} is already 16 kHz mono WAV, transcribing it without decoding")
+            wav_path = mp3_path
+    
+    if VAD_ENABLED or LONG_FILE_ENABLED or _fast_model is not None:
+        return transcribe_in_memory(mp3_path, threads, wav_path)
+    
+    if wav_path is not None:
+        return transcribe_wav(wav_path, threads)
+    
+    if STREAM_DECODE and get_backend().stdin_supported is not False:
+        segments, piped = stream_transcribe(mp3_path, threads)
+        if piped:
+            return segments
+        print("↩️  Backend could not read from a pipe, falling back to a temporary WAV file")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        wav_path = Path(tmpdir) / "converted.wav"
+        
+        # Convert to WAV
+        if not convert_mp3_to_wav(mp3_path, wav_path):
+            return None
+        
+        return transcribe_wav(wav_path, threads)
+
+def transcription_options() -> Dict:
+    """Options that change the transcript, used together with the model as the cache key."""
+    options = {'backend': get_backend().name}
+    if VAD_ENABLED:
+        options['vad'] = [VAD_THRESHOLD_DB, VAD_MIN_SILENCE_MS, VAD_PADDING_MS]
+    if LONG_FILE_ENABLED:
+        options['chunking'] = [LONG_FILE_SECONDS, CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS]
+    if _fast_model is not None:
+        options['tiered'] = [str(resolve_model(_fast_model)), TIER_CONFIDENCE_THRESHOLD, TIER_FILE_FRACTION]
+    return options
+
+def transcript_cache_key(mp3_path: Path) -> Optional[str]:
+    """Cache key for the MP3 with the current model and options, or None if caching is off."""
+    if not TRANSCRIPT_CACHE_ENABLED:
+        return None
+    return get_cache().key(mp3_path, get_backend().model, transcription_options())
+
+def is_cached(mp3_path: Path) -> bool:
+    """Check whether a transcript for the MP3 is already in the cache."""
+    key = transcript_cache_key(mp3_path)
+    return key is not None and get_cache().entry_path(key).exists()
+
+def reuse_transcript(source_mp3: Path, target_mp3: Path, offset_ms: int) -> bool:
+    """
+    Cache source_mp3's transcript as target_mp3's, shifted by offset_ms (the same audio
+    starts offset_ms later in target_mp3), so the target is written without transcribing.
+    """
+    source_key = transcript_cache_key(source_mp3)
+    segments = get_cache().get(source_key) if source_key else None
+    if segments is None:
         return False
+    
+    shifted = [
+        dict(segment, start=max(0, segment['start'] + offset_ms), end=segment['end'] + offset_ms)
+        for segment in segments
+        if segment['end'] + offset_ms > 0
+    ]
+    get_cache().put(transcript_cache_key(target_mp3), shifted, target_mp3,
+                    get_backend().model, transcription_options())
+    return True
+
+def generate_subtitles(mp3_path: Path, subtitle_formats: Union[str, List[str]],
+                       action: Optional[str] = None,
+                       threads: Optional[int] = None,
+                       wav_path: Optional[Path] = None) -> bool:
+    """
+    Generate subtitles from an audio or video file using whisper.
+    All requested formats are rendered from a single transcription pass.
+    If action is given ('proceed' or 'overwrite'), the existing-subtitle prompt is skipped.
+    If threads is given, it is passed to the backend as the per-job thread count.
+    If wav_path is given (already decoded by the batch pipeline), conversion is skipped.
+    Stage timings are recorded in the run metrics.
+    """
+    with get_metrics().track_file(mp3_path) as record:
+        try:
+            success = _generate_subtitles(mp3_path, subtitle_formats, action, threads, wav_path)
+        except subprocess.TimeoutExpired as e:
+            print(f"⏱️  {mp3_path.name}: {Path(e.cmd[0]).name} timed out after {e.timeout:.0f}s")
+            return False
+        if success and record['outcome'] != 'skipped':
+            record['outcome'] = 'processed'
+        return success
 
-def generate_subtitles(mp3_path: Path, subtitle_format: str) -> bool:
-    """Generate subtitles from MP3 file using whisper."""
+def _generate_subtitles(mp3_path: Path, subtitle_formats: Union[str, List[str]],
+                        action: Optional[str], threads: Optional[int],
+                        wav_path: Optional[Path]) -> bool:
+    subtitle_formats = normalize_formats(subtitle_formats)
+    formats_label = "/".join(fmt.upper() for fmt in subtitle_formats)
     
     # Check for existing subtitles and get user preference
-    action = handle_existing_subtitles(mp3_path, subtitle_format)
+    if action is None:
+        action = handle_existing_subtitles(mp3_path, subtitle_formats)
     
     if action == 'skip':
         print(f"⏭️  Skipping {mp3_path.name}")
+        get_metrics().set_outcome('skipped')
         return True  # Return True as it's not an error, just a skip
     elif action == 'cancel':
         print("❌ Operation cancelled by user")
@@ -44,32 +398,42 @@ def generate_subtitles(mp3_path: Path, subtitle_format: str) -> bool:
     
     # If we get here, proceed with generation (either new file or overwrite)
     if action == 'overwrite':
-        print(f"🔄 Overwriting existing {subtitle_format.upper()} file...")
+        print(f"🔄 Overwriting existing {formats_label} file...")
     
-    with tempfile.TemporaryDirectory() as tmpdir:
-        wav_path = Path(tmpdir) / "converted.wav"
-        
-        # Convert MP3 to WAV
-        if not convert_mp3_to_wav(mp3_path, wav_path):
+    metrics = get_metrics()
+    with metrics.stage('cache'):
+        cache_key = transcript_cache_key(mp3_path)
+        segments = get_cache().get(cache_key) if cache_key else None
+    
+    if segments is not None:
+        print(f"⚡ Using cached transcript for {mp3_path.name}")
+    else:
+        segments = transcribe_mp3(mp3_path, threads, wav_path)
+        if segments is None:
             return False
+        if cache_key:
+            with metrics.stage('cache'):
+                get_cache().put(cache_key, segments, mp3_path, get_backend().model, transcription_options())
         
-        # Determine output path
-        output_path = mp3_path.parent / f"{mp3_path.stem}.{subtitle_format}"
-        
-        print(f"📢 Running whisper-cli on {wav_path.name}...\n")
-        
-        cmd = [
-            str(WHISPER_CLI),
-            "-m", str(WHISPER_MODEL),
-            "-f", str(wav_path),
-            f"--output-{subtitle_format}",
-            "-of", str(output_path.with_suffix(''))  # Output to same directory as MP3
-        ]
-        
-        try:
-            subprocess.run(cmd, check=True)
+        if 'audio_seconds' not in metrics.current():
+            if wav_path is not None:
+                metrics.set_audio_duration((wav_path.stat().st_size - 44) / (16000 * 2))
+            else:
+                metrics.set_audio_duration(probe_duration(mp3_path))
+    
+    # Output to same directory as the audio
+    with metrics.stage('write'):
+        for subtitle_format in subtitle_formats:
+            output_path = subtitle_path(mp3_path, subtitle_format)
+            write_subtitle(segments, output_path, subtitle_format)
             print(f"✅ {subtitle_format.upper()} file generated at {output_path}")
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Error running whisper-cli: {e}")
-            return False
\ No newline at end of file
+    
+    if SEARCH_INDEX_ENABLED:
+        from search_index import get_search_index
+        
+        with metrics.stage('index'):
+            try:
+                get_search_index().add(mp3_path, segments, subtitle_formats)
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not update the search index: {e}")
+    return True
@@ -0,0 +1,375 @@
+import atexit
+import io
+import json
+import math
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Union
+from metrics import get_metrics
+from process_runner import get_runner
+from progress import whisper_progress
+from config import (
+    TRANSCRIPTION_BACKEND, WHISPER_CLI, WHISPER_MODEL, WHISPER_MODELS_DIR,
+    WHISPER_SERVER, WHISPER_SERVER_HOST, WHISPER_SERVER_PORT, WHISPER_SERVER_URL
+)
+
+# Audio is a WAV path, a readable binary stream of WAV data (e.g. ffmpeg's stdout)
+# or the WAV data itself
+AudioSource = Union[Path, BinaryIO, bytes]
+
+def resolve_model(model: Union[str, Path]) -> Path:
+    """Accept a model path or a model name such as "small" (ggml-small.bin in WHISPER_MODELS_DIR)."""
+    path = Path(model).expanduser()
+    if path.suffix == ".bin" or path.exists():
+        return path
+    return WHISPER_MODELS_DIR / f"ggml-{model}.bin"
+
+class TranscriptionBackend:
+    """
+    Base class for transcription backends.
+    transcribe() returns a list of segments ({'start': ms, 'end': ms, 'text': str} plus
+    'confidence' from 0 to 1 when the backend reports it) or None if transcription
+    failed (the error is printed).
+    """
+    name = "base"
+    stdin_supported: Optional[bool] = True  # Whether audio may be a stream or bytes (None: not known yet)
+    
+    def __init__(self, model: Path = WHISPER_MODEL):
+        self.model = model
+    
+    def with_model(self, model: Path) -> "TranscriptionBackend":
+        """A backend of the same kind that uses another model."""
+        return type(self)(model=model)
+    
+    def transcribe(self, audio: AudioSource, threads: Optional[int] = None) -> Optional[List[Dict]]:
+        raise NotImplementedError
+    
+    def probe_stdin(self) -> bool:
+        """Whether audio may be passed as a stream or bytes, finding out once if it isn't known yet."""
+        return bool(self.stdin_supported)
+    
+    def close(self):
+        """Release any resources held by the backend."""
+        pass
+
+LOAD_TIME_PATTERN = re.compile(r"load time\s*=\s*([\d.]+)\s*ms")
+
+def silent_wav(seconds: float) -> bytes:
+    """A 16 kHz mono 16-bit WAV of silence."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\0\0" * int(seconds * 16000))
+    return buffer.getvalue()
+
+class WhisperCliBackend(TranscriptionBackend):
+    """One-shot backend: runs a fresh whisper-cli process (and model load) per file."""
+    name = "cli"
+    
+    def __init__(self, model: Path = WHISPER_MODEL, cli: Path = WHISPER_CLI):
+        super().__init__(model)
+        self.cli = cli
+        self.stdin_supported = None
+        self._probe_lock = threading.Lock()
+    
+    def with_model(self, model: Path) -> "WhisperCliBackend":
+        backend = WhisperCliBackend(model=model, cli=self.cli)
+        backend.stdin_supported = self.stdin_supported  # Same binary
+        return backend
+    
+    def _runs(self, audio_input: str, input: Optional[bytes] = None) -> bool:
+        """Whether whisper-cli transcribes the given input and writes its output."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_base = Path(tmpdir) / "probe"
+            result = get_runner().run(self.command(audio_input, output_base, 1),
+                                      input=input, transcriber=True)
+            return result.returncode == 0 and output_base.with_suffix(".json").exists()
+    
+    def probe_stdin(self) -> bool:
+        """
+        Whether this whisper-cli build reads audio from stdin ("-f -"). Probed once with
+        two seconds of silence: through a pipe and, if that fails, from a file. Only if the
+        file works and the pipe doesn't is pipe input the problem; otherwise the model or
+        the binary is broken, and a temporary file wouldn't help either.
+        """
+        with self._probe_lock:
+            if self.stdin_supported is None:
+                audio = silent_wav(2.0)
+                if self._runs("-", input=audio):
+                    self.stdin_supported = True
+                else:
+                    with tempfile.TemporaryDirectory() as tmpdir:
+                        wav_path = Path(tmpdir) / "silence.wav"
+                        wav_path.write_bytes(audio)
+                        self.stdin_supported = not self._runs(str(wav_path))
+            return self.stdin_supported
+    
+    def command(self, audio_input: str, output_base: Path, threads: Optional[int] = None) -> List[str]:
+        """Build the whisper-cli command for an audio path (or '-' for stdin)."""
+        cmd = [
+            str(self.cli),
+            "-m", str(self.model),
+            "-f", audio_input,
+            "-ojf",  # Full JSON includes token probabilities
+            "-of", str(output_base),
+            "-pp"  # Progress on stderr
+        ]
+        
+        if threads:
+            cmd += ["-t", str(threads)]
+        
+        return cmd
+    
+    def transcribe(self, audio: AudioSource, threads: Optional[int] = None) -> Optional[List[Dict]]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_base = Path(tmpdir) / "transcript"
+            
+            if isinstance(audio, Path):
+                cmd, stdin = self.command(str(audio), output_base, threads), {}
+            elif isinstance(audio, bytes):
+                cmd, stdin = self.command("-", output_base, threads), {'input': audio}
+            else:
+                cmd, stdin = self.command("-", output_base, threads), {'stdin': audio}
+            
+            record = get_metrics().current()
+            label = Path(record['file']).name if record else "whisper-cli"
+            start = time.perf_counter()
+            with whisper_progress(label) as on_stderr:
+                result = get_runner().run(cmd, on_stderr=on_stderr, transcriber=True, **stdin)
+            wall = time.perf_counter() - start
+            stderr = result.stderr
+            
+            if result.returncode != 0:
+                print(stderr[-2000:], end="")
+                print(f"❌ Error running whisper-cli: exit status {result.returncode}")
+                return None
+            
+            # whisper-cli reports its model load time; the rest is inference
+            load_match = LOAD_TIME_PATTERN.search(stderr)
+            load = min(wall, float(load_match.group(1)) / 1000) if load_match else 0.0
+            get_metrics().add_stage('model_load', load)
+            get_metrics().add_stage('inference', wall - load)
+            
+            with open(output_base.with_suffix(".json"), encoding="utf-8") as f:
+                data = json.load(f)
+        
+        segments = []
+        for item in data.get('transcription', []):
+            segment = {
+                'start': item['offsets']['from'],
+                'end': item['offsets']['to'],
+                'text': item['text'].strip()
+            }
+            # Special tokens ([_BEG_], [_TT_...]) don't say anything about the words
+            probabilities = [t['p'] for t in item.get('tokens', []) if not t['text'].startswith('[_')]
+            if probabilities:
+                segment['confidence'] = sum(probabilities) / len(probabilities)
+            segments.append(segment)
+        return segments
+
+def free_port(host: str) -> int:
+    """A TCP port on host that nothing listens on right now."""
+    import socket
+    
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+class WhisperServerBackend(TranscriptionBackend):
+    """
+    Long-lived backend: a whisper.cpp server loads the model once and serves every file
+    over a local HTTP socket. The server is started on first use unless a URL is given.
+    """
+    name = "server"
+    
+    def __init__(self, model: Path = WHISPER_MODEL, server: Path = WHISPER_SERVER,
+                 url: Optional[str] = WHISPER_SERVER_URL,
+                 host: str = WHISPER_SERVER_HOST, port: int = WHISPER_SERVER_PORT,
+                 startup_timeout: float = 120.0):
+        super().__init__(model)
+        self.server = server
+        self.url = url or f"http://{host}:{port}"
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self._owns_server = url is None
+        self._lock = threading.Lock()
+    
+    def with_model(self, model: Path) -> "WhisperServerBackend":
+        # A second local server on a free port, so both models stay loaded
+        if not self._owns_server:
+            raise ValueError("another model needs a local whisper-server, not WHISPER_SERVER_URL")
+        return WhisperServerBackend(model=model, server=self.server, host=self.host,
+                                    port=free_port(self.host), startup_timeout=self.startup_timeout)
+    
+    def is_ready(self) -> bool:
+        """Check whether the server answers HTTP requests."""
+        import urllib.error
+        import urllib.request
+        
+        try:
+            with urllib.request.urlopen(self.url + "/", timeout=1):
+                return True
+        except urllib.error.HTTPError:
+            return True  # Any HTTP answer means the server is up
+        except OSError:
+            return False
+    
+    def start(self) -> bool:
+        """Start the server process (if we own it) and wait until it is ready."""
+        with self._lock:
+            if self.process is not None and self.process.poll() is None:
+                return True
+            if not self._owns_server:
+                return self.is_ready()
+            
+            print(f"🚀 Starting whisper server with {Path(self.model).name}...")
+            cmd = [
+                str(self.server),
+                "-m", str(self.model),
+                "--host", self.host,
+                "--port", str(self.port),
+                "-t", str(os.cpu_count() or 1),
+            ]
+            self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            
+            deadline = time.monotonic() + self.startup_timeout
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    print(f"❌ whisper server exited with status {self.process.returncode}")
+                    self.process = None
+                    return False
+                if self.is_ready():
+                    return True
+                time.sleep(0.2)
+            
+            print("❌ whisper server did not become ready in time")
+            self.close()
+            return False
+    
+    def transcribe(self, audio: AudioSource, threads: Optional[int] = None) -> Optional[List[Dict]]:
+        # The server's thread count is fixed when it starts, so `threads` is ignored here
+        with get_metrics().stage('model_load'):
+            if not self.start():
+                return None
+        
+        if isinstance(audio, Path):
+            data = audio.read_bytes()
+        elif isinstance(audio, bytes):
+            data = audio
+        else:
+            data = audio.read()
+        body, content_type = encode_multipart(
+            {'response_format': 'verbose_json', 'temperature': '0.0'},
+            'file', 'audio.wav', data
+        )
+        import urllib.request  # Only the server backend needs HTTP
+        
+        request = urllib.request.Request(
+            self.url + "/inference", data=body, headers={'Content-Type': content_type}
+        )
+        
+        try:
+            with get_metrics().stage('inference'), urllib.request.urlopen(request) as response:
+                result = json.load(response)
+        except (OSError, ValueError) as e:
+            print(f"❌ Error talking to whisper server: {e}")
+            return None
+        
+        if 'error' in result:
+            print(f"❌ whisper server error: {result['error']}")
+            return None
+        
+        segments = []
+        for item in result.get('segments', []):
+            segment = {
+                'start': round(float(item['start']) * 1000),
+                'end': round(float(item['end']) * 1000),
+                'text': item['text'].strip()
+            }
+            if 'avg_logprob' in item:
+                segment['confidence'] = math.exp(float(item['avg_logprob']))
+            segments.append(segment)
+        return segments
+    
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+def encode_multipart(fields: Dict[str, str], file_field: str, filename: str, data: bytes):
+    """Encode form fields and one file as multipart/form-data. Returns (body, content_type)."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f'Content-Type: audio/wav\r\n\r\n'.encode()
+    )
+    parts.append(data)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+BACKENDS = {
+    'cli': WhisperCliBackend,
+    'server': WhisperServerBackend,
+}
+
+_backend = None
+_model_backends: Dict[Path, TranscriptionBackend] = {}
+_backend_lock = threading.Lock()
+
+def configure_backend(name: str = TRANSCRIPTION_BACKEND, model: Path = WHISPER_MODEL,
+                      **options) -> TranscriptionBackend:
+    """
+    Replace the shared backend, e.g. with a backend or model chosen on the command line.
+    Extra options are passed to the backend (e.g. cli=... for a different whisper-cli).
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+        for backend in _model_backends.values():
+            backend.close()
+        _model_backends.clear()
+        _backend = BACKENDS[name](model=resolve_model(model), **options)
+        atexit.register(_backend.close)
+        return _backend
+
+def get_backend() -> TranscriptionBackend:
+    """Get the shared backend selected in config (created on first use)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = BACKENDS[TRANSCRIPTION_BACKEND]()
+            atexit.register(_backend.close)
+        return _backend
+
+def get_model_backend(model: Union[str, Path]) -> TranscriptionBackend:
+    """Get a shared backend like get_backend() but running another model (created on first use)."""
+    backend = get_backend()
+    path = resolve_model(model)
+    if path == backend.model:
+        return backend
+    with _backend_lock:
+        if path not in _model_backends:
+            _model_backends[path] = backend.with_model(path)
+            atexit.register(_model_backends[path].close)
+        return _model_backends[path]
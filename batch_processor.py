@@ -1,22 +1,66 @@
-import questionary
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple, Union
+from config import BATCH_WORKERS, DEDUP_ENABLED, SCHEDULE_LONGEST_FIRST, STREAM_DECODE, TRANSCRIPT_CACHE_ENABLED
 from file_utils import list_mp3_files
 from subtitle_checker import check_existing_subtitles, get_existing_subtitle_files
-from audio_processor import generate_subtitles
+from audio_processor import generate_subtitles, reuse_transcript
+from decode_pipeline import DecodePipeline
+from governor import get_governor
+from job_journal import JobJournal
+from metrics import get_metrics
+from process_runner import Cancelled, get_runner
+from media_probe import get_probes
+from scheduler import Progress, estimate_missing, format_eta, longest_first
+from subtitle_writer import normalize_formats
 
 class BatchProcessor:
-    def __init__(self, folder_path: Path, subtitle_format: str):
+    def __init__(self, folder_path: Path, subtitle_formats: Union[str, List[str]],
+                 workers: Optional[int] = None, mp3_files: Optional[List[str]] = None,
+                 resume: Optional[bool] = None, dedupe: Optional[bool] = None,
+                 longest_first: Optional[bool] = None):
+        """
+        Process the MP3 files in folder_path, or only mp3_files
+        (paths relative to folder_path) if given.
+        resume: continue an interrupted run from the journal (None = ask if there is one).
+        dedupe: transcribe only one file of each group of near-duplicate recordings
+        (default: DEDUP_ENABLED).
+        longest_first: with several workers, start the longest files first
+        (default: SCHEDULE_LONGEST_FIRST).
+        """
         self.folder_path = folder_path
-        self.subtitle_format = subtitle_format
-        self.mp3_files = list_mp3_files(folder_path)
+        self.subtitle_formats = normalize_formats(subtitle_formats)
+        self.formats_label = "/".join(fmt.upper() for fmt in self.subtitle_formats)
+        self.mp3_files = mp3_files if mp3_files is not None else list_mp3_files(folder_path)
+        self.workers = max(1, workers or BATCH_WORKERS)
+        get_runner().allow_transcribers(self.workers)  # Cores are split between all workers
+        self.journal = JobJournal(folder_path)
+        self.resume = resume
         self.results = {'processed': 0, 'skipped': 0, 'failed': 0, 'total': 0}
+        self.file_results: List[Tuple[str, str]] = []  # (mp3_file, outcome) in processing order
+        self.dedupe = DEDUP_ENABLED if dedupe is None else dedupe
+        if self.dedupe and not TRANSCRIPT_CACHE_ENABLED:
+            print("⚠️  Duplicate detection needs the transcript cache (TRANSCRIPT_CACHE_ENABLED)")
+            self.dedupe = False
+        self.duplicates: Dict[str, Tuple[str, int]] = {}  # mp3_file -> (representative, offset_ms)
+        self.duplicate_seconds: Dict[str, float] = {}     # Audio duration of each duplicate
+        self.reused: List[str] = []  # Duplicates written from their representative's transcript
+        self.longest_first = SCHEDULE_LONGEST_FIRST if longest_first is None else longest_first
+        self.audio_done = 0.0   # Seconds of audio transcribed, for the throughput summary
+        self.run_seconds = 0.0  # Wall time spent in run_plan
+    
+    def threads_per_job(self) -> int:
+        """Split the available cores evenly between concurrent whisper-cli jobs."""
+        return max(1, (os.cpu_count() or 1) // self.workers)
     
     def analyze_folder(self) -> Dict[str, List[str]]:
-        """Analyze all MP3 files in the folder and categorize them."""
+        """Analyze all audio files in the folder and categorize them."""
         analysis = {
-            'needs_processing': [],      # Files that need the requested format
-            'already_has_format': [],    # Files that already have the requested format
+            'needs_processing': [],      # Files missing at least one requested format
+            'already_has_format': [],    # Files that already have a requested format
             'has_other_formats': [],     # Files that have other subtitle formats
             'no_subtitles': []          # Files with no subtitles at all
         }
@@ -26,17 +70,34 @@ class BatchProcessor:
             existing = check_existing_subtitles(mp3_path)
             existing_formats = get_existing_subtitle_files(mp3_path)
             
-            if existing[self.subtitle_format]:
+            present = [fmt for fmt in self.subtitle_formats if existing[fmt]]
+            
+            if present:
                 analysis['already_has_format'].append(mp3_file)
             elif existing_formats:
                 analysis['has_other_formats'].append(mp3_file)
-                analysis['needs_processing'].append(mp3_file)
             else:
                 analysis['no_subtitles'].append(mp3_file)
+            
+            if len(present) < len(self.subtitle_formats):
                 analysis['needs_processing'].append(mp3_file)
         
+        if self.dedupe:
+            self.find_duplicates()
+        
         return analysis
     
+    def find_duplicates(self):
+        """Fingerprint the files and map each near-duplicate to its group's representative."""
+        import fingerprint
+        
+        print(f"🔍 Fingerprinting {len(self.mp3_files)} files to find duplicates...")
+        paths = [self.folder_path / mp3_file for mp3_file in self.mp3_files]
+        for path, (representative, offset_ms) in fingerprint.find_duplicates(paths).items():
+            mp3_file = str(path.relative_to(self.folder_path))
+            self.duplicates[mp3_file] = (str(representative.relative_to(self.folder_path)), offset_ms)
+            self.duplicate_seconds[mp3_file] = fingerprint.fingerprint(path)[1]
+    
     def display_analysis(self, analysis: Dict[str, List[str]]):
         """Display the folder analysis to the user."""
         total_files = len(self.mp3_files)
@@ -44,9 +105,9 @@ class BatchProcessor:
         already_has = len(analysis['already_has_format'])
         
         print(f"\n📊 Folder Analysis:")
-        print(f"   Total MP3 files: {total_files}")
-        print(f"   Need {self.subtitle_format.upper()} processing: {needs_processing}")
-        print(f"   Already have {self.subtitle_format.upper()}: {already_has}")
+        print(f"   Total audio files: {total_files}")
+        print(f"   Need {self.formats_label} processing: {needs_processing}")
+        print(f"   Already have {self.formats_label}: {already_has}")
         
         if analysis['no_subtitles']:
             print(f"   No subtitles: {len(analysis['no_subtitles'])}")
@@ -54,9 +115,15 @@ class BatchProcessor:
         if analysis['has_other_formats']:
             print(f"   Have other formats: {len(analysis['has_other_formats'])}")
         
+        if self.duplicates:
+            groups = len(set(representative for representative, _ in self.duplicates.values()))
+            minutes = sum(self.duplicate_seconds.values()) / 60
+            print(f"   Near-duplicates: {len(self.duplicates)} files of {groups} recordings "
+                  f"({minutes:.1f} min of audio that won't be transcribed again)")
+        
         # Show some examples
         if analysis['already_has_format']:
-            print(f"\n   Files with existing {self.subtitle_format.upper()}:")
+            print(f"\n   Files with existing {self.formats_label}:")
             for file in analysis['already_has_format'][:3]:
                 print(f"   • {file}")
             if len(analysis['already_has_format']) > 3:
@@ -68,7 +135,9 @@ class BatchProcessor:
             # No conflicts, can proceed directly
             return 'proceed'
         
-        print(f"\n⚠️  Found {len(analysis['already_has_format'])} files that already have {self.subtitle_format.upper()} subtitles.")
+        import questionary
+        
+        print(f"\n⚠️  Found {len(analysis['already_has_format'])} files that already have {self.formats_label} subtitles.")
         
         strategy = questionary.select(
             "How do you want to handle files that already have the requested format?",
@@ -91,12 +160,15 @@ class BatchProcessor:
         else:
             return 'cancel'
     
-    def process_all_files(self) -> Dict[str, int]:
-        """Process all MP3 files in the folder according to user preferences."""
+    def process_all_files(self, strategy: Optional[str] = None, confirm: bool = True) -> Dict[str, int]:
+        """
+        Process all audio files in the folder according to user preferences.
+        Pass a strategy ('skip_existing' or 'overwrite_all') and confirm=False to run without prompts.
+        """
         analysis = self.analyze_folder()
         
         if not self.mp3_files:
-            print("No MP3 files found in the folder.")
+            print("No audio files found in the folder.")
             return self.results
         
         self.display_analysis(analysis)
@@ -105,18 +177,36 @@ class BatchProcessor:
             print("No files to process!")
             return self.results
         
-        strategy = self.get_processing_strategy(analysis)
+        if strategy is None:
+            strategy = self.get_processing_strategy(analysis)
         
         if strategy == 'cancel':
             print("❌ Batch operation cancelled.")
             return self.results
         
+        if self.resume is None:
+            self.resume = False
+            if confirm and self.journal.has_unfinished():
+                import questionary
+                self.resume = bool(questionary.confirm(
+                    "A previous batch run in this folder did not finish. Resume it?"
+                ).ask())
+        
+        if self.resume:
+            print(f"↩️  Resuming from journal {self.journal.path}")
+        else:
+            self.journal.reset()
+        
         # Determine which files to process
         files_to_process = []
         
-        if strategy == 'skip_existing':
+        if self.resume:
+            # Interrupted files may look complete, so let the journal decide per file
+            files_to_process = self.mp3_files
+        elif strategy == 'skip_existing':
+            # Files with some of the formats only get the missing ones
             files_to_process = analysis['needs_processing']
-            self.results['skipped'] = len(analysis['already_has_format'])
+            self.results['skipped'] = len(self.mp3_files) - len(files_to_process)
         elif strategy == 'overwrite_all':
             files_to_process = self.mp3_files
         elif strategy == 'ask_each':
@@ -131,48 +221,219 @@ class BatchProcessor:
             return self.results
         
         # Confirm before starting
-        if strategy != 'ask_each':
-            confirm = questionary.confirm(
+        if confirm and strategy != 'ask_each':
+            import questionary
+            confirmed = questionary.confirm(
                 f"Process {len(files_to_process)} files? This may take a while."
             ).ask()
             
-            if not confirm:
+            if not confirmed:
                 print("❌ Operation cancelled.")
                 return self.results
         
+        # Resolve every prompt up front so workers never block on questionary
+        plan = self.build_plan(files_to_process, strategy)
+        plan, duplicate_plan = self.split_duplicates(plan)
+        
         # Process files
-        print(f"\n🚀 Starting batch processing of {len(files_to_process)} files...\n")
+        print(f"\n🚀 Starting batch processing of {len(files_to_process)} files...")
+        if get_governor() is not None:
+            print(f"   Up to {self.workers} workers; the resource governor sets jobs and threads")
+        elif self.workers > 1:
+            print(f"   Using {self.workers} workers with {self.threads_per_job()} threads each")
+        print()
+        
+        self.run_plan(plan)
+        if duplicate_plan:
+            self.run_duplicates(duplicate_plan)
         
-        for i, mp3_file in enumerate(files_to_process, 1):
+        return self.results
+    
+    def build_plan(self, files_to_process: List[str], strategy: str) -> List[Tuple[str, Optional[str], List[str]]]:
+        """
+        Decide the action and formats for every file before processing starts.
+        Returns list of (mp3_file, action, formats) where action is 'proceed',
+        'overwrite' or None (skip).
+        """
+        plan = []
+        
+        for mp3_file in files_to_process:
             mp3_path = self.folder_path / mp3_file
+            existing = check_existing_subtitles(mp3_path)
+            present = [fmt for fmt in self.subtitle_formats if existing[fmt]]
+            missing = [fmt for fmt in self.subtitle_formats if not existing[fmt]]
+            resume_status = self.journal.status(mp3_file, self.subtitle_formats) if self.resume else None
             
-            print(f"[{i}/{len(files_to_process)}] Processing: {mp3_file}")
+            if resume_status == 'done':
+                plan.append((mp3_file, None, []))
+                continue
+            elif resume_status == 'redo':
+                # Outputs of an unfinished or stale file can't be trusted
+                plan.append((mp3_file, 'overwrite', self.subtitle_formats))
+                continue
             
-            # Handle individual file strategy
-            if strategy == 'ask_each':
-                existing = check_existing_subtitles(mp3_path)
-                if existing[self.subtitle_format]:
-                    proceed = questionary.confirm(
-                        f"File already has {self.subtitle_format.upper()}. Overwrite?"
-                    ).ask()
-                    if not proceed:
-                        print("   ⏭️  Skipped")
-                        self.results['skipped'] += 1
-                        continue
+            if not present:
+                plan.append((mp3_file, 'proceed', self.subtitle_formats))
+                continue
             
-            # Process the file
-            success = generate_subtitles(mp3_path, self.subtitle_format)
+            overwrite = strategy in ('overwrite_all', 'proceed')
+            if strategy == 'ask_each':
+                import questionary
+                present_label = "/".join(fmt.upper() for fmt in present)
+                overwrite = questionary.confirm(
+                    f"{mp3_file} already has {present_label}. Overwrite?"
+                ).ask()
             
-            if success:
-                self.results['processed'] += 1
-                print(f"   ✅ Completed ({self.results['processed']}/{len(files_to_process)})")
+            if overwrite:
+                plan.append((mp3_file, 'overwrite', self.subtitle_formats))
+            elif missing:
+                plan.append((mp3_file, 'proceed', missing))
+            else:
+                plan.append((mp3_file, None, []))
+        
+        return plan
+    
+    def split_duplicates(self, plan: List[Tuple[str, Optional[str], List[str]]]):
+        """Move near-duplicates out of the plan, to run after their representatives."""
+        originals = [entry for entry in plan if entry[1] is None or entry[0] not in self.duplicates]
+        duplicates = [entry for entry in plan if entry[1] is not None and entry[0] in self.duplicates]
+        return originals, duplicates
+    
+    def run_duplicates(self, plan: List[Tuple[str, Optional[str], List[str]]]):
+        """
+        Seed the transcript cache of every duplicate from its representative, then run
+        the duplicates (written from the cache, or transcribed if that wasn't possible).
+        """
+        print(f"♻️  Writing {len(plan)} near-duplicates from their representatives...")
+        for mp3_file, _, _ in plan:
+            representative, offset_ms = self.duplicates[mp3_file]
+            if reuse_transcript(self.folder_path / representative, self.folder_path / mp3_file, offset_ms):
+                self.reused.append(mp3_file)
             else:
-                self.results['failed'] += 1
-                print(f"   ❌ Failed")
+                print(f"   ⚠️  No transcript of {representative} to reuse, transcribing {mp3_file}")
+        print()
+        self.run_plan(plan)
+    
+    def process_file(self, mp3_file: str, action: str, formats: List[str],
+                     wav_path: Optional[Path]) -> bool:
+        """Transcribe a single file of the plan, from its prefetched WAV if there is one."""
+        threads = self.threads_per_job() if self.workers > 1 else None
+        return generate_subtitles(self.folder_path / mp3_file, formats,
+                                  action=action, threads=threads, wav_path=wav_path)
+    
+    def schedule(self, jobs: List[Tuple[int, str, str, List[str]]]) -> Optional[Progress]:
+        """
+        Probe (or look up) the duration of every job for the ETA and, with several
+        workers, reorder the jobs longest first. Returns None for a single job or
+        when no duration could be read.
+        """
+        if len(jobs) < 2:
+            return None
+        
+        paths = [self.folder_path / mp3_file for _, mp3_file, _, _ in jobs]
+        probes = get_probes().probe_all(paths)
+        durations = estimate_missing({path: info and info['duration'] for path, info in probes.items()})
+        seconds = {mp3_file: durations[path] for (_, mp3_file, _, _), path in zip(jobs, paths)}
+        if not any(seconds.values()):
+            return None
+        
+        if self.longest_first and self.workers > 1:
+            jobs[:] = [jobs[i] for i in longest_first([seconds[mp3_file] for _, mp3_file, _, _ in jobs])]
+            longest = jobs[0][1]
+            print(f"📐 Longest files first: {format_eta(sum(seconds.values()))} of audio, "
+                  f"longest {longest} ({format_eta(seconds[longest])})")
+        return Progress(seconds, [mp3_file for _, mp3_file, _, _ in jobs], self.workers)
+    
+    def run_plan(self, plan: List[Tuple[str, Optional[str], List[str]]]):
+        """
+        Run the plan through the decode pipeline and the worker pool.
+        Results are recorded in plan order regardless of completion order.
+        """
+        total = len(plan)
+        outcomes: List[str] = ['skipped'] * total
+        jobs = [(i, mp3_file, action, formats)
+                for i, (mp3_file, action, formats) in enumerate(plan) if action is not None]
+        
+        if len(jobs) < total:
+            print(f"⏭️  Skipping {total - len(jobs)} files")
+        
+        progress = self.schedule(jobs)
+        started = time.perf_counter()
+        started_count = [0]
+        completed = [0]
+        lock = threading.Lock()
+        runner = get_runner()
+        
+        def worker(pipeline: DecodePipeline):
+            while True:
+                item = pipeline.get()
+                if item is None or runner.cancelled:
+                    return
+                job_index, wav_path = item
+                plan_index, mp3_file, action, formats = jobs[job_index]
+                
+                with lock:
+                    started_count[0] += 1
+                    print(f"[{started_count[0]}/{len(jobs)}] Processing: {mp3_file}")
+                self.journal.record_start(mp3_file)
+                if progress:
+                    progress.start(mp3_file)
+                try:
+                    success = self.process_file(mp3_file, action, formats, wav_path)
+                except Cancelled:
+                    return  # Left unfinished in the journal, so --resume redoes it
+                except Exception as e:
+                    print(f"   ❌ Error processing {mp3_file}: {e}")
+                    success = False
+                finally:
+                    pipeline.release(wav_path)
+                
+                if success:
+                    self.journal.record_done(mp3_file, self.subtitle_formats)
+                else:
+                    self.journal.record_failed(mp3_file)
+                
+                outcomes[plan_index] = 'processed' if success else 'failed'
+                if progress:
+                    progress.finish(mp3_file, success)
+                with lock:
+                    completed[0] += 1
+                    status = "✅ Completed" if success else "❌ Failed"
+                    print(f"   {status}: {mp3_file} ({completed[0]}/{len(jobs)})")
+                    if progress and completed[0] < len(jobs):
+                        print(f"   {progress.status_line()}")
+                    print()
+        
+        # Prefetching only pays off when whisper-cli reads WAV files from disk
+        mp3_paths = [self.folder_path / mp3_file for _, mp3_file, _, _ in jobs]
+        with DecodePipeline(mp3_paths, enabled=not STREAM_DECODE) as pipeline:
+            try:
+                if self.workers == 1:
+                    worker(pipeline)
+                else:
+                    with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                        futures = [executor.submit(worker, pipeline) for _ in range(self.workers)]
+                        try:
+                            for future in futures:
+                                future.result()
+                        except KeyboardInterrupt:
+                            runner.cancel_all()  # Before the executor waits for the workers
+                            raise
+            except KeyboardInterrupt:
+                print("\n🛑 Interrupted, stopping running jobs...")
+                runner.cancel_all()
+                raise
             
-            print()  # Empty line for readability
+            if jobs and pipeline.enabled:
+                print(f"⏱️  Time spent waiting on decode: {pipeline.wait_seconds:.1f}s")
         
-        return self.results
+        if progress:
+            self.audio_done += progress.audio_done
+        self.run_seconds += time.perf_counter() - started
+        
+        for (mp3_file, _, _), outcome in zip(plan, outcomes):
+            self.file_results.append((mp3_file, outcome))
+            self.results[outcome] += 1
     
     def display_summary(self):
         """Display the final processing summary."""
@@ -183,11 +444,28 @@ class BatchProcessor:
         print(f"Files skipped: {self.results['skipped']}")
         print(f"Files failed: {self.results['failed']}")
         print(f"Success rate: {(self.results['processed']/(self.results['processed']+self.results['failed'])*100):.1f}%" if (self.results['processed']+self.results['failed']) > 0 else "N/A")
+        
+        if self.audio_done and self.run_seconds:
+            print(f"📈 Throughput: {self.audio_done / 3600:.2f} h of audio in {format_eta(self.run_seconds)} "
+                  f"({self.audio_done / self.run_seconds:.1f} audio-hours per hour)")
+        
+        metrics = get_metrics()
+        if self.reused:
+            saved_audio = sum(self.duplicate_seconds.get(mp3_file, 0.0) for mp3_file in self.reused)
+            line = f"♻️  Reused transcripts for {len(self.reused)} near-duplicates ({saved_audio / 60:.1f} min of audio)"
+            rate = metrics.inference_rate()
+            if rate is not None:
+                line += f", about {saved_audio * rate:.0f}s of inference saved"
+            print(line)
+        for line in metrics.summary_lines():
+            print(line)
+        metrics.write_prometheus()
         print("="*50)
 
-def batch_process_folder(folder_path: Path, subtitle_format: str):
-    """Main function to batch process all MP3 files in a folder."""
-    processor = BatchProcessor(folder_path, subtitle_format)
+def batch_process_folder(folder_path: Path, subtitle_formats: Union[str, List[str]],
+                         workers: Optional[int] = None, resume: Optional[bool] = None):
+    """Main function to batch process all audio files in a folder."""
+    processor = BatchProcessor(folder_path, subtitle_formats, workers=workers, resume=resume)
     results = processor.process_all_files()
     processor.display_summary()
     return results
\ No newline at end of file
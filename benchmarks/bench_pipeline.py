@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Benchmark the decode -> transcribe -> write pipeline.
+
+Generates a synthetic MP3 corpus locally with ffmpeg, runs generate_subtitles (single)
+and BatchProcessor (batch) against a deterministic stand-in whisper or the real
+backend from config.py, and prints the results as JSON.
+
+Examples:
+    python benchmarks/bench_pipeline.py --files 20 --duration 30
+    python benchmarks/bench_pipeline.py --backend stub-server --workers 4 --output run.json
+    python benchmarks/bench_pipeline.py --backend real --files 5 --duration 60
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import audio_processor  # noqa: E402
+import backends  # noqa: E402
+import decode_pipeline  # noqa: E402
+from batch_processor import BatchProcessor  # noqa: E402
+from config import TRANSCRIPTION_BACKEND, WHISPER_MODEL, WHISPER_SERVER_HOST  # noqa: E402
+
+def generate_corpus(directory: Path, files: int, duration: float) -> List[Path]:
+    """Create `files` MP3s of `duration` seconds (tones over low noise) with ffmpeg."""
+    paths = []
+    for i in range(files):
+        path = directory / f"track_{i:04d}.mp3"
+        source = (f"sine=frequency={220 + 20 * i}:duration={duration},"
+                  f"volume=0.5[tone];anoisesrc=d={duration}:a=0.01[noise];[tone][noise]amix")
+        subprocess.run([
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-filter_complex", source, "-ac", "1", "-b:a", "128k", str(path)
+        ], check=True)
+        paths.append(path)
+    return paths
+
+def setup_backend(kind: str):
+    """Install the backend to benchmark as the shared backend."""
+    if kind == "stub":
+        return backends.configure_backend("cli", Path("stub-model.bin"),
+                                          cli=BENCH_DIR / "stub_whisper_cli.py")
+    if kind == "stub-server":
+        return backends.configure_backend("server", Path("stub-model.bin"),
+                                          server=BENCH_DIR / "stub_whisper_server.py",
+                                          port=backends.free_port(WHISPER_SERVER_HOST))
+    return backends.configure_backend(TRANSCRIPTION_BACKEND, WHISPER_MODEL)
+
+class StageTimer:
+    """Records wall time of every call to the instrumented pipeline functions."""
+    
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._patches = []
+    
+    def wrap(self, owner, attribute: str, stage: str):
+        original = getattr(owner, attribute)
+        
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        
+        setattr(owner, attribute, timed)
+        self._patches.append((owner, attribute, original))
+    
+    def restore(self):
+        for owner, attribute, original in reversed(self._patches):
+            setattr(owner, attribute, original)
+        self._patches = []
+    
+    def reset(self):
+        self.samples = {}
+
+class DiskMonitor(threading.Thread):
+    """Polls the size of a directory tree and keeps the peak."""
+    
+    def __init__(self, directory: Path, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        while not self._stop_event.is_set():
+            total = 0
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+            self.peak_bytes = max(self.peak_bytes, total)
+            self._stop_event.wait(self.interval)
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p99': pick(0.99),
+        'max': ordered[-1],
+    }
+
+def run_mode(mode: str, corpus_dir: Path, mp3_paths: List[Path], formats: List[str],
+             workers: int, timer: StageTimer, temp_dir: Path, audio_seconds: float) -> Dict:
+    """Run one benchmark mode and collect its metrics."""
+    for path in corpus_dir.iterdir():
+        if path.suffix.lstrip(".") in formats:
+            path.unlink()
+    timer.reset()
+    
+    monitor = DiskMonitor(temp_dir)
+    monitor.start()
+    start = time.perf_counter()
+    
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if mode == "single":
+            file_times = []
+            failed = 0
+            for mp3_path in mp3_paths:
+                file_start = time.perf_counter()
+                if not audio_processor.generate_subtitles(mp3_path, formats, action='overwrite'):
+                    failed += 1
+                file_times.append(time.perf_counter() - file_start)
+            timer.samples['file'] = file_times
+        else:
+            processor = BatchProcessor(corpus_dir, formats, workers=workers)
+            results = processor.process_all_files(strategy='overwrite_all', confirm=False)
+            failed = results['failed']
+    
+    wall = time.perf_counter() - start
+    monitor.stop()
+    
+    return {
+        'mode': mode,
+        'files': len(mp3_paths),
+        'failed': failed,
+        'workers': workers if mode == "batch" else 1,
+        'audio_seconds': audio_seconds,
+        'wall_seconds': wall,
+        'files_per_second': len(mp3_paths) / wall,
+        'realtime_factor': wall / audio_seconds,
+        'stages': {stage: percentiles(values) for stage, values in timer.samples.items() if values},
+        'peak_temp_disk_mb': monitor.peak_bytes / (1024 * 1024),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'peak_child_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10, help="Number of synthetic MP3s")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio per file")
+    parser.add_argument("--formats", default="srt", help="Comma-separated subtitle formats")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Batch workers")
+    parser.add_argument("--modes", default="single,batch", help="Comma-separated: single, batch")
+    parser.add_argument("--backend", choices=["stub", "stub-server", "real"], default="stub")
+    parser.add_argument("--rtf", type=float, default=0.05, help="Realtime factor of the stub backends")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpus")
+    args = parser.parse_args()
+    
+    os.environ["STUB_WHISPER_RTF"] = str(args.rtf)
+    formats = args.formats.split(",")
+    
+    work_dir = Path(tempfile.mkdtemp(prefix="whispsub-bench-"))
+    corpus_dir = work_dir / "corpus"
+    temp_dir = work_dir / "tmp"
+    corpus_dir.mkdir()
+    temp_dir.mkdir()
+    
+    # Measure cold runs only, and keep every temporary file where DiskMonitor can see it
+    audio_processor.TRANSCRIPT_CACHE_ENABLED = False
+    tempfile.tempdir = str(temp_dir)
+    
+    timer = StageTimer()
+    timer.wrap(audio_processor, "convert_mp3_to_wav", "decode")
+    timer.wrap(decode_pipeline, "convert_mp3_to_wav", "decode")
+    timer.wrap(audio_processor, "decode_pcm", "decode")
+    timer.wrap(audio_processor, "transcribe_mp3", "decode+transcribe")
+    timer.wrap(audio_processor, "write_subtitle", "write")
+    
+    try:
+        mp3_paths = generate_corpus(corpus_dir, args.files, args.duration)
+        backend = setup_backend(args.backend)
+        timer.wrap(backend, "transcribe", "transcribe")
+        
+        report = {
+            'backend': args.backend,
+            'files': args.files,
+            'duration_seconds': args.duration,
+            'formats': formats,
+            'cpu_count': os.cpu_count(),
+            'runs': [
+                run_mode(mode, corpus_dir, mp3_paths, formats, args.workers, timer,
+                         temp_dir, args.files * args.duration)
+                for mode in args.modes.split(",")
+            ],
+        }
+    finally:
+        timer.restore()
+        backends.get_backend().close()
+        if args.keep:
+            print(f"Corpus kept in {corpus_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the startup of headless commands.
+
+Runs each command in a fresh interpreter several times, reports the median wall
+time and the slowest imports (from `python -X importtime`) as JSON, and checks that
+no headless command loads the interactive prompt stack (questionary/prompt_toolkit).
+Exits with status 1 if a command is over --budget-ms or loads a forbidden module,
+so it can guard startup in CI.
+
+Examples:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --budget-ms 250 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+
+# Modules that only the interactive mode (main.py without arguments) may import
+FORBIDDEN_MODULES = ("questionary", "prompt_toolkit")
+
+def headless_commands(queue_db: Path) -> Dict[str, List[str]]:
+    """Name -> argv (after the interpreter) of the commands to time."""
+    return {
+        'help': ["main.py", "run", "--help"],
+        'queue-status': ["main.py", "queue", "--queue", str(queue_db)],
+        'run-imports': ["-c", "import cli, audio_processor, batch_processor, prerequisites"],
+        'prerequisites': ["-c", "from prerequisites import check_prerequisites; check_prerequisites()"],
+    }
+
+def time_command(argv: List[str], runs: int) -> List[float]:
+    """Wall time in milliseconds of each run."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def import_profile(argv: List[str]) -> Dict[str, int]:
+    """Cumulative import time in microseconds per top-level module, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *argv], cwd=REPO_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Runs per command (median is reported)")
+    parser.add_argument("--budget-ms", type=float, default=300.0,
+                        help="Fail if a command's median startup is slower than this")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to report per command")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    
+    # "-c" commands import the repository modules
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_DIR), os.environ.get("PYTHONPATH")]))
+    
+    failures = []
+    results = []
+    with tempfile.TemporaryDirectory(prefix="whispsub-startup-") as work_dir:
+        for name, argv in headless_commands(Path(work_dir) / "queue.sqlite").items():
+            time_command(argv, 1)  # Warm the page cache, .pyc files and the prerequisite probe
+            times = time_command(argv, args.runs)
+            modules = import_profile(argv)
+            forbidden = sorted(m for m in modules if m.split(".")[0] in FORBIDDEN_MODULES)
+            median = statistics.median(times)
+            
+            if median > args.budget_ms:
+                failures.append(f"{name}: median {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+            if forbidden:
+                failures.append(f"{name}: imports {', '.join(forbidden)}")
+            
+            slowest = sorted(modules.items(), key=lambda item: -item[1])[:args.top]
+            results.append({
+                'command': name,
+                'argv': argv,
+                'median_ms': round(median, 1),
+                'min_ms': round(min(times), 1),
+                'max_ms': round(max(times), 1),
+                'forbidden_imports': forbidden,
+                'slowest_imports_ms': {module: round(us / 1000, 1) for module, us in slowest},
+            })
+    
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'budget_ms': args.budget_ms,
+        'commands': results,
+        'failures': failures,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+    
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
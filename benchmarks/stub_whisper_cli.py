@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for whisper-cli, used by the benchmarks.
+Reads the WAV given with -f (or stdin for '-'), sleeps for a simulated model load
+plus audio duration * STUB_WHISPER_RTF, and writes a JSON transcript (-oj) with
+one segment every 5 seconds of audio. With -ojf each segment also has tokens
+with a fixed probability, for exercising tiered models, and -pp prints progress
+lines like whisper-cli.
+
+Environment:
+    STUB_WHISPER_RTF          simulated realtime factor (default 0.05)
+    STUB_WHISPER_LOAD_SECONDS simulated model load time (default 0.2)
+    STUB_WHISPER_CONFIDENCE   token probability reported with -ojf (default 0.9)
+    STUB_WHISPER_LOW_SEGMENTS comma-separated segment numbers reported with probability
+                              STUB_WHISPER_LOW_CONFIDENCE (default 0.1) instead
+    STUB_WHISPER_TEXT         segment text, formatted with {i} (segment number) and
+                              {model} (model file stem) (default " segment {i}")
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BYTES_PER_SECOND = 16000 * 2  # 16 kHz mono 16-bit
+WAV_HEADER_BYTES = 44
+SEGMENT_MS = 5000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", dest="model")
+    parser.add_argument("-f", dest="file", required=True)
+    parser.add_argument("-of", dest="output_base", required=True)
+    parser.add_argument("-t", dest="threads", type=int, default=4)
+    parser.add_argument("-oj", dest="json", action="store_true")
+    parser.add_argument("-ojf", dest="json_full", action="store_true")
+    parser.add_argument("-pp", dest="print_progress", action="store_true")
+    args, _ = parser.parse_known_args()
+    
+    if args.file == "-":
+        data = sys.stdin.buffer.read()
+    else:
+        with open(args.file, "rb") as f:
+            data = f.read()
+    duration_ms = max(0, len(data) - WAV_HEADER_BYTES) * 1000 // BYTES_PER_SECOND
+    
+    rtf = float(os.environ.get("STUB_WHISPER_RTF", "0.05"))
+    load_seconds = float(os.environ.get("STUB_WHISPER_LOAD_SECONDS", "0.2"))
+    confidence = float(os.environ.get("STUB_WHISPER_CONFIDENCE", "0.9"))
+    low_confidence = float(os.environ.get("STUB_WHISPER_LOW_CONFIDENCE", "0.1"))
+    low_segments = {int(i) for i in os.environ.get("STUB_WHISPER_LOW_SEGMENTS", "").split(",") if i}
+    text = os.environ.get("STUB_WHISPER_TEXT", " segment {i}")
+    model = Path(args.model or "").stem
+    time.sleep(load_seconds)
+    for percent in range(10, 101, 10):
+        time.sleep(duration_ms / 1000 * rtf / 10)
+        if args.print_progress:
+            print(f"whisper_print_progress_callback: progress = {percent:3d}%", file=sys.stderr, flush=True)
+    
+    transcription = []
+    for i, start in enumerate(range(0, duration_ms, SEGMENT_MS)):
+        end = min(start + SEGMENT_MS, duration_ms)
+        item = {
+            "offsets": {"from": start, "to": end},
+            "text": text.format(i=i, model=model),
+        }
+        if args.json_full:
+            p = low_confidence if i in low_segments else confidence
+            item["tokens"] = [
+                {"text": "[_BEG_]", "p": 1.0},
+                {"text": " segment", "p": p},
+                {"text": f" {i}", "p": p},
+            ]
+        transcription.append(item)
+    
+    if args.json or args.json_full:
+        with open(args.output_base + ".json", "w", encoding="utf-8") as f:
+            json.dump({"transcription": transcription}, f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for whisper.cpp's whisper-server, used by the benchmarks.
+Accepts the same arguments as whisper-server (only --host/--port are used), answers
+POST /inference with a verbose_json transcript of one segment every 5 seconds of audio,
+and sleeps for audio duration * STUB_WHISPER_RTF per request.
+"""
+
+import argparse
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+BYTES_PER_SECOND = 16000 * 2
+SEGMENT_SECONDS = 5.0
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"stub whisper server")
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        duration = max(0, len(body) - 1024) / BYTES_PER_SECOND  # Roughly minus multipart overhead
+        time.sleep(duration * float(os.environ.get("STUB_WHISPER_RTF", "0.05")))
+        
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + SEGMENT_SECONDS, duration)
+            segments.append({"start": start, "end": end, "text": f" segment {len(segments)}"})
+            start = end
+        
+        payload = json.dumps({"segments": segments}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8178)
+    args, _ = parser.parse_known_args()
+    
+    time.sleep(float(os.environ.get("STUB_WHISPER_LOAD_SECONDS", "0.2")))
+    HTTPServer((args.host, args.port), InferenceHandler).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from config import CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS
+from vad import FRAME_MS, SAMPLE_RATE, frame_energy_db
+
+# Quiet points are searched this far on either side of each target boundary
+SEARCH_SECONDS = 15
+
+# A chunk is (audio_start, audio_end, owned_start, owned_end) in samples: the audio that is
+# transcribed (with overlap) and the part of the timeline whose segments it keeps.
+Chunk = Tuple[int, int, int, int]
+
+def find_cut_points(samples: np.ndarray, chunk_seconds: float = CHUNK_SECONDS) -> List[int]:
+    """Pick a cut near every chunk_seconds, at the quietest frame within the search window."""
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    energy = frame_energy_db(samples, frame_len)
+    chunk_frames = int(chunk_seconds * 1000 // FRAME_MS)
+    search_frames = SEARCH_SECONDS * 1000 // FRAME_MS
+    
+    cuts = []
+    target = chunk_frames
+    while target < len(energy) - chunk_frames // 4:  # Don't leave a tiny last chunk
+        low = max(target - search_frames, (cuts[-1] // frame_len + 1) if cuts else 1)
+        high = min(target + search_frames, len(energy) - 1)
+        cut_frame = low + int(np.argmin(energy[low:high])) if high > low else target
+        cuts.append(cut_frame * frame_len)
+        target = cut_frame + chunk_frames
+    return cuts
+
+def plan_chunks(samples: np.ndarray, chunk_seconds: float = CHUNK_SECONDS,
+                overlap_seconds: float = CHUNK_OVERLAP_SECONDS) -> List[Chunk]:
+    """Split the audio at quiet points into overlapping chunks."""
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    bounds = [0] + find_cut_points(samples, chunk_seconds) + [len(samples)]
+    return [
+        (max(0, start - overlap), min(len(samples), end + overlap), start, end)
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^\w]+", " ", text.lower()).strip()
+
+def merge_chunks(chunks: List[Chunk], chunk_segments: List[List[Dict]]) -> List[Dict]:
+    """
+    Shift each chunk's segments to the file timeline and merge them.
+    A segment is kept by the chunk that owns its midpoint, so the overlap zones are
+    not transcribed twice; repeated text across a boundary is dropped as well.
+    """
+    merged = []
+    for (audio_start, _, owned_start, owned_end), segments in zip(chunks, chunk_segments):
+        offset_ms = audio_start * 1000 // SAMPLE_RATE
+        owned_start_ms = owned_start * 1000 // SAMPLE_RATE
+        owned_end_ms = owned_end * 1000 // SAMPLE_RATE
+        
+        for segment in segments:
+            start, end = segment['start'] + offset_ms, segment['end'] + offset_ms
+            midpoint = (start + end) // 2
+            if not owned_start_ms <= midpoint < owned_end_ms:
+                continue
+            
+            if merged and start < merged[-1]['end'] and _normalize(segment['text']) == _normalize(merged[-1]['text']):
+                continue  # Same words heard by both chunks
+            
+            start = max(start, merged[-1]['end'] if merged else 0)  # No overlap with the previous segment
+            if start >= end:
+                continue  # Entirely covered by the previous chunk's segment
+            merged.append(dict(segment, start=start, end=end))
+    return merged
@@ -0,0 +1,335 @@
+"""
+Headless command line interface for unattended runs (cron, job queues).
+Usage: python main.py run PATH [PATH ...] [--format srt] [--on-existing skip|overwrite]
+"""
+
+import argparse
+import glob
+import os
+import signal
+from pathlib import Path
+from typing import List, Optional
+from config import (
+    BATCH_WORKERS, DEDUP_ENABLED, GOVERNOR_ENABLED, METRICS_JSONL, METRICS_PROMETHEUS, PROCESS_TIMEOUT_SECONDS,
+    QUEUE_DB, QUEUE_LEASE_SECONDS, SCHEDULE_LONGEST_FIRST,
+    TIER_FAST_MODEL, TIERED_ENABLED, TRANSCRIPTION_BACKEND, WATCH_DEBOUNCE_SECONDS, WHISPER_MODEL
+)
+from file_utils import list_mp3_files
+from library_index import AUDIO_EXTENSIONS
+from subtitle_writer import SUBTITLE_FORMATS
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILURES = 1      # Some files failed
+EXIT_USAGE = 2         # Bad arguments, no input files or missing prerequisites
+EXIT_INTERRUPTED = 130
+
+CONFLICT_STRATEGIES = {
+    'skip': 'skip_existing',
+    'overwrite': 'overwrite_all',
+}
+
+def expand_inputs(patterns: List[str], recursive: bool = False) -> List[Path]:
+    """Expand files, directories (their audio files) and glob patterns into a sorted list of audio paths."""
+    paths = []
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)  # A quoted "~/..." pattern reaches us unexpanded
+        is_glob = glob.has_magic(pattern)
+        matches = glob.glob(pattern, recursive=True) if is_glob else [pattern]
+        found = len(paths)
+        for match in matches:
+            path = Path(match).resolve()
+            if path.is_dir():
+                paths.extend(path / name for name in list_mp3_files(path, recursive=recursive))
+            elif path.is_file() and path.suffix.lower() in AUDIO_EXTENSIONS:
+                paths.append(path)
+            elif not is_glob:
+                print(f"⚠️  Not an audio file or folder: {match}")
+        if is_glob and len(paths) == found:
+            print(f"⚠️  No audio files match: {pattern}")
+    return sorted(set(paths))
+
+def add_model_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("-m", "--model", default=WHISPER_MODEL,
+                        help="ggml model path or name, e.g. small or medium (default: from config)")
+    parser.add_argument("--backend", choices=["cli", "server"], default=TRANSCRIPTION_BACKEND,
+                        help=f"Transcription backend (default: {TRANSCRIPTION_BACKEND})")
+    parser.add_argument("--tiered", action="store_true", default=TIERED_ENABLED,
+                        help="Transcribe with a fast model first, re-running low-confidence parts with --model")
+    parser.add_argument("--fast-model", default=TIER_FAST_MODEL,
+                        help=f"Fast model path or name for --tiered (default: {TIER_FAST_MODEL})")
+    parser.add_argument("--governor", action="store_true", default=GOVERNOR_ENABLED,
+                        help="Adapt concurrent jobs (up to --workers) and threads to load and free memory")
+    parser.add_argument("--timeout", type=float, default=PROCESS_TIMEOUT_SECONDS,
+                        help="Kill a decode or transcription that takes longer than this many seconds")
+
+def add_run_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("paths", nargs="+", help="Audio/video files, folders or glob patterns")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Include audio files in subfolders of the given folders")
+    parser.add_argument("-f", "--format", dest="formats", action="append", choices=SUBTITLE_FORMATS,
+                        help="Subtitle format to generate (repeatable, default: srt)")
+    parser.add_argument("--on-existing", choices=sorted(CONFLICT_STRATEGIES), default="skip",
+                        help="What to do with files that already have a requested format (default: skip)")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS,
+                        help=f"Files transcribed concurrently (default: {BATCH_WORKERS})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, redoing only unfinished or stale files")
+    parser.add_argument("--dedupe", action="store_true", default=DEDUP_ENABLED,
+                        help="Transcribe one file per group of near-duplicate recordings and reuse it for the rest")
+    parser.add_argument("--order", choices=["longest", "name"],
+                        default="longest" if SCHEDULE_LONGEST_FIRST else "name",
+                        help="Order of files with several workers: longest first (shortest total time) or by name")
+    parser.add_argument("--metrics-jsonl", type=Path, default=METRICS_JSONL,
+                        help="Append per-file stage timings to this JSON lines file")
+    parser.add_argument("--metrics-prom", type=Path, default=METRICS_PROMETHEUS,
+                        help="Write run metrics to this Prometheus textfile at the end")
+    add_model_arguments(parser)
+
+def add_watch_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("paths", nargs="+", type=Path, help="Folders to watch (recursively)")
+    parser.add_argument("-f", "--format", dest="formats", action="append", choices=SUBTITLE_FORMATS,
+                        help="Subtitle format to generate (repeatable, default: srt)")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS,
+                        help=f"Files transcribed concurrently (default: {BATCH_WORKERS})")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS,
+                        help=f"Seconds a file must stay unchanged (default: {WATCH_DEBOUNCE_SECONDS})")
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using inotify")
+    parser.add_argument("--initial-scan", action="store_true",
+                        help="Also transcribe existing files that are missing subtitles")
+    add_model_arguments(parser)
+
+def add_enqueue_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("paths", nargs="+", help="Audio/video files, folders or glob patterns")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Include audio files in subfolders of the given folders")
+    parser.add_argument("-f", "--format", dest="formats", action="append", choices=SUBTITLE_FORMATS,
+                        help="Subtitle format to generate (repeatable, default: srt)")
+    parser.add_argument("--on-existing", choices=sorted(CONFLICT_STRATEGIES), default="skip",
+                        help="What to do with files that already have a requested format (default: skip)")
+    parser.add_argument("--queue", type=Path, default=QUEUE_DB, help=f"Queue database (default: {QUEUE_DB})")
+
+def add_work_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--queue", type=Path, default=QUEUE_DB, help=f"Queue database (default: {QUEUE_DB})")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS,
+                        help=f"Files transcribed concurrently by this process (default: {BATCH_WORKERS})")
+    parser.add_argument("--wait", action="store_true",
+                        help="Keep waiting for new jobs instead of exiting when the queue is empty")
+    parser.add_argument("--lease", type=float, default=QUEUE_LEASE_SECONDS,
+                        help=f"Lease length in seconds, renewed while a job runs (default: {QUEUE_LEASE_SECONDS})")
+    parser.add_argument("--metrics-jsonl", type=Path, default=METRICS_JSONL,
+                        help="Append per-file stage timings to this JSON lines file")
+    add_model_arguments(parser)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="whispsub",
+        description="Generate subtitles from audio files with whisper.cpp, without prompts."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = subparsers.add_parser("run", help="Transcribe files, folders or globs")
+    add_run_arguments(run_parser)
+    run_parser.set_defaults(handler=command_run)
+    
+    watch_parser = subparsers.add_parser("watch", help="Transcribe new audio as it appears in folders")
+    add_watch_arguments(watch_parser)
+    watch_parser.set_defaults(handler=command_watch)
+    
+    enqueue_parser = subparsers.add_parser("enqueue", help="Queue files for distributed workers")
+    add_enqueue_arguments(enqueue_parser)
+    enqueue_parser.set_defaults(handler=command_enqueue)
+    
+    work_parser = subparsers.add_parser("work", help="Process jobs from a shared queue")
+    add_work_arguments(work_parser)
+    work_parser.set_defaults(handler=command_work)
+    
+    status_parser = subparsers.add_parser("queue", help="Show the state of a shared queue")
+    status_parser.add_argument("--queue", type=Path, default=QUEUE_DB, help=f"Queue database (default: {QUEUE_DB})")
+    status_parser.set_defaults(handler=command_queue)
+    
+    search_parser = subparsers.add_parser("search", help="Find transcript segments that mention words or a phrase")
+    search_parser.add_argument("query", nargs="+", help="Words that must all occur in a segment")
+    search_parser.add_argument("--phrase", action="store_true", help="Match the words as one phrase, in order")
+    search_parser.add_argument("-n", "--limit", type=int, default=20, help="Maximum number of matches (default: 20)")
+    search_parser.add_argument("--json", action="store_true", help="Print one JSON object per match (times in ms)")
+    search_parser.set_defaults(handler=command_search)
+    
+    index_parser = subparsers.add_parser("index", help="Update the search index from existing subtitles")
+    index_parser.add_argument("paths", nargs="+", type=Path, help="Folders to index (recursively)")
+    index_parser.set_defaults(handler=command_index)
+    
+    return parser
+
+def configure_transcription(args: argparse.Namespace):
+    """Apply the backend and model options from the command line."""
+    from audio_processor import configure_tiering
+    from backends import configure_backend
+    from governor import configure_governor
+    from process_runner import get_runner
+    
+    configure_backend(args.backend, args.model)
+    configure_governor(args.governor, getattr(args, 'workers', None))
+    configure_tiering(args.fast_model if args.tiered else None)
+    get_runner().timeout = args.timeout
+
+def command_run(args: argparse.Namespace) -> int:
+    """Transcribe the given inputs with BatchProcessor, without any prompts."""
+    from batch_processor import BatchProcessor
+    from metrics import start_run
+    from prerequisites import check_prerequisites
+    
+    if args.workers < 1:
+        print("❌ --workers must be at least 1")
+        return EXIT_USAGE
+    
+    if not check_prerequisites(args.backend, args.model, args.fast_model if args.tiered else None,
+                               dedupe=args.dedupe):
+        return EXIT_USAGE
+    
+    mp3_paths = expand_inputs(args.paths, recursive=args.recursive)
+    if not mp3_paths:
+        print("❌ No audio files found.")
+        return EXIT_USAGE
+    
+    configure_transcription(args)
+    start_run(args.metrics_jsonl, args.metrics_prom)
+    
+    # BatchProcessor works on paths relative to one folder
+    root = Path(os.path.commonpath([str(p.parent) for p in mp3_paths]))
+    mp3_files = [str(p.relative_to(root)) for p in mp3_paths]
+    
+    processor = BatchProcessor(root, args.formats or ["srt"], workers=args.workers,
+                               mp3_files=mp3_files, resume=args.resume, dedupe=args.dedupe,
+                               longest_first=args.order == "longest")
+    results = processor.process_all_files(strategy=CONFLICT_STRATEGIES[args.on_existing], confirm=False)
+    processor.display_summary()
+    
+    return EXIT_FAILURES if results['failed'] else EXIT_OK
+
+def command_watch(args: argparse.Namespace) -> int:
+    """Run the watch-folder daemon until interrupted or terminated."""
+    from prerequisites import check_prerequisites
+    from watcher import WatchDaemon
+    
+    if args.workers < 1:
+        print("❌ --workers must be at least 1")
+        return EXIT_USAGE
+    
+    if not check_prerequisites(args.backend, args.model, args.fast_model if args.tiered else None):
+        return EXIT_USAGE
+    
+    roots = [path.expanduser().resolve() for path in args.paths]
+    for root in roots:
+        if not root.is_dir():
+            print(f"❌ Not a folder: {root}")
+            return EXIT_USAGE
+    
+    configure_transcription(args)
+    daemon = WatchDaemon(roots, args.formats or ["srt"], workers=args.workers,
+                         debounce=args.debounce, polling=args.poll, initial_scan=args.initial_scan)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    daemon.run()
+    return EXIT_OK
+
+def command_enqueue(args: argparse.Namespace) -> int:
+    """Queue every input file that needs subtitles, for `work` processes on any host."""
+    from job_queue import JobQueue
+    from subtitle_writer import subtitle_path
+    
+    mp3_paths = expand_inputs(args.paths, recursive=args.recursive)
+    if not mp3_paths:
+        print("❌ No audio files found.")
+        return EXIT_USAGE
+    
+    formats = args.formats or ["srt"]
+    jobs = []
+    for mp3_path in mp3_paths:
+        present = [fmt for fmt in formats if subtitle_path(mp3_path, fmt).exists()]
+        if args.on_existing == 'overwrite' and present:
+            jobs.append((mp3_path, formats, 'overwrite'))
+        elif len(present) < len(formats):
+            jobs.append((mp3_path, [fmt for fmt in formats if fmt not in present], 'proceed'))
+    
+    job_queue = JobQueue(args.queue)
+    queued = job_queue.enqueue(jobs)
+    print(f"📥 Queued {queued} files in {args.queue} "
+          f"({len(mp3_paths) - len(jobs)} already have subtitles, {len(jobs) - queued} already queued)")
+    return EXIT_OK
+
+def command_work(args: argparse.Namespace) -> int:
+    """Lease jobs from the queue and transcribe them until it is drained."""
+    from job_queue import JobQueue, QueueWorker
+    from metrics import start_run
+    from prerequisites import check_prerequisites
+    
+    if args.workers < 1:
+        print("❌ --workers must be at least 1")
+        return EXIT_USAGE
+    
+    if not check_prerequisites(args.backend, args.model, args.fast_model if args.tiered else None):
+        return EXIT_USAGE
+    
+    configure_transcription(args)
+    start_run(args.metrics_jsonl, None)
+    worker = QueueWorker(JobQueue(args.queue, lease_seconds=args.lease), workers=args.workers, wait=args.wait)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.run()
+    
+    print(f"🏁 Worker finished: {worker.stats['processed']} done, {worker.stats['failed']} failed")
+    return EXIT_FAILURES if worker.stats['failed'] else EXIT_OK
+
+def command_queue(args: argparse.Namespace) -> int:
+    """Print job counts per status and the latest failures."""
+    from job_queue import JobQueue
+    
+    job_queue = JobQueue(args.queue)
+    counts = job_queue.counts()
+    print(f"📋 {args.queue}")
+    for status in ['queued', 'leased', 'done', 'failed']:
+        print(f"   {status:<7} {counts.get(status, 0)}")
+    for path, error in job_queue.failures():
+        print(f"   ❌ {path}: {error}")
+    return EXIT_OK
+
+def command_search(args: argparse.Namespace) -> int:
+    """Print the best matching segments with their file and timecode."""
+    import json
+    from search_index import get_search_index
+    from subtitle_writer import format_srt_timestamp
+    
+    matches = get_search_index().search(" ".join(args.query), limit=args.limit, phrase=args.phrase)
+    for path, start_ms, end_ms, text in matches:
+        if args.json:
+            print(json.dumps({'file': str(path), 'start_ms': start_ms, 'end_ms': end_ms, 'text': text},
+                             ensure_ascii=False))
+        else:
+            print(f"{path}  [{format_srt_timestamp(start_ms)}]  {text}")
+    if not matches and not args.json:
+        print("No matches.")
+    return EXIT_OK
+
+def command_index(args: argparse.Namespace) -> int:
+    """Index the subtitles below the given folders, re-reading only changed ones."""
+    from search_index import get_search_index
+    
+    search_index = get_search_index()
+    for root in args.paths:
+        if not root.is_dir():
+            print(f"❌ Not a folder: {root}")
+            return EXIT_USAGE
+        counts = search_index.update(root)
+        print(f"🔎 {root}: {counts['indexed']} indexed, {counts['unchanged']} unchanged, "
+              f"{counts['removed']} removed")
+    files, segments = search_index.stats()
+    print(f"   Index: {files} files, {segments} segments in {search_index.db_path}")
+    return EXIT_OK
+
+def run(argv: Optional[List[str]] = None) -> int:
+    """Parse the command line and run the selected command. Returns the exit status."""
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        print("\n❌ Interrupted.")
+        return EXIT_INTERRUPTED
@@ -4,4 +4,95 @@ from pathlib import Path
 HOME = Path.home()
 MUSIC_DIR = HOME / "Music"
 WHISPER_CLI = HOME / "Workspace/whisper.cpp/build/bin/whisper-cli"
-WHISPER_MODEL = HOME / "Workspace/whisper.cpp/models/ggml-medium.bin"
\ No newline at end of file
+WHISPER_MODEL = HOME / "Workspace/whisper.cpp/models/ggml-medium.bin"
+
+# Batch processing
+BATCH_WORKERS = 1  # Number of files transcribed concurrently in batch mode
+DECODE_PREFETCH = 2  # MP3s decoded to WAV ahead of the file being transcribed
+DECODE_TEMP_BUDGET_MB = 1024  # Max disk used by prefetched WAV files
+STREAM_DECODE = True  # Pipe ffmpeg output into whisper-cli instead of writing a temp WAV
+SCHEDULE_LONGEST_FIRST = True  # Start the longest files first (durations probed and cached)
+
+# Transcription backend: "cli" runs whisper-cli once per file,
+# "server" keeps a whisper.cpp server running with the model loaded
+TRANSCRIPTION_BACKEND = "cli"
+WHISPER_SERVER = HOME / "Workspace/whisper.cpp/build/bin/whisper-server"
+WHISPER_SERVER_HOST = "127.0.0.1"
+WHISPER_SERVER_PORT = 8178
+WHISPER_SERVER_URL = None  # Set to use an already running server instead of starting one
+
+# Transcript cache (keyed by audio content, model and options)
+CACHE_DIR = HOME / ".cache/whispsub"
+TRANSCRIPT_CACHE_ENABLED = True
+TRANSCRIPT_CACHE_DIR = CACHE_DIR / "transcripts"
+TRANSCRIPT_CACHE_MAX_MB = 512
+JOURNAL_DIR = CACHE_DIR / "journals"  # Per-folder batch journals used by --resume
+LIBRARY_INDEX_PATH = CACHE_DIR / "library_index.json"  # Cached scan of audio files and subtitles
+PREREQUISITES_CACHE = CACHE_DIR / "prerequisites.json"  # Last successful tool/model check
+MEDIA_PROBE_CACHE = CACHE_DIR / "media_probe.json"  # ffprobe results (format, audio stream, duration)
+
+# Silence trimming before inference (requires numpy)
+VAD_ENABLED = False
+VAD_THRESHOLD_DB = -45.0     # Frames quieter than this (dBFS) never count as speech
+VAD_MIN_SILENCE_MS = 1000    # Shorter pauses are kept as part of the speech region
+VAD_PADDING_MS = 200         # Audio kept around each speech region
+
+# Long files are split at quiet points and the chunks transcribed in parallel (requires numpy)
+LONG_FILE_ENABLED = False
+LONG_FILE_SECONDS = 1800     # Files longer than this are chunked
+CHUNK_SECONDS = 600          # Target chunk length
+CHUNK_OVERLAP_SECONDS = 5    # Audio shared by neighbouring chunks
+CHUNK_WORKERS = 4            # Chunks transcribed concurrently
+
+# Run metrics: per-stage wall/CPU time per file
+METRICS_JSONL = None       # Append one JSON line per file here (Path), or None
+METRICS_PROMETHEUS = None  # Write a Prometheus textfile here at the end of a run (Path), or None
+
+# Watch mode (python main.py watch DIR ...)
+WATCH_DEBOUNCE_SECONDS = 5   # A file must stay unchanged this long before it is transcribed
+WATCH_POLL_SECONDS = 10      # Scan interval when inotify is not available
+WATCH_QUEUE_SIZE = 1000      # Max files waiting for a worker
+
+# Models: WHISPER_MODEL is the default; other ggml models can be chosen by name (e.g. "small")
+WHISPER_MODELS_DIR = HOME / "Workspace/whisper.cpp/models"
+
+# Tiered transcription: fast model first, default model only where confidence is low
+TIERED_ENABLED = False
+TIER_FAST_MODEL = "base"
+TIER_CONFIDENCE_THRESHOLD = 0.6  # Mean token probability below which a segment is re-run
+TIER_FILE_FRACTION = 0.5         # Re-run the whole file if more segments than this are low
+
+# External processes (ffmpeg, whisper-cli) run on an asyncio event loop
+MAX_TRANSCRIBER_PROCESSES = 4  # whisper-cli processes allowed to run at once (raised to the batch workers)
+PROCESS_TIMEOUT_SECONDS = None  # Kill a decode or transcription that runs longer, or None
+PROGRESS_ENABLED = True         # Live progress line while ffmpeg/whisper-cli run (terminals only)
+
+# Near-duplicate detection in batch runs (requires numpy and the transcript cache)
+DEDUP_ENABLED = False
+FINGERPRINT_SECONDS = 180            # Audio fingerprinted from the start of each file
+FINGERPRINT_CACHE_DIR = CACHE_DIR / "fingerprints"
+DEDUP_MAX_BIT_ERROR = 0.35           # Fingerprints differing in fewer bits than this match
+DEDUP_MAX_OFFSET_SECONDS = 30        # Largest difference in start point that is detected
+DEDUP_DURATION_TOLERANCE_SECONDS = 2.0
+
+# Multi-node mode: a coordinator enqueues jobs, workers on any host lease them
+QUEUE_DB = CACHE_DIR / "queue.sqlite"  # Put this on storage shared by all hosts
+QUEUE_LEASE_SECONDS = 300    # A job is handed out again if its worker stops renewing the lease
+QUEUE_MAX_ATTEMPTS = 3       # Leases per job before it is marked failed
+
+# Full-text search over the written transcripts (python main.py search PHRASE)
+SEARCH_INDEX_ENABLED = True  # Index every transcript as its subtitles are written
+SEARCH_INDEX_DB = CACHE_DIR / "search.sqlite"
+
+# Adaptive resource governor (Linux, /proc): adapts concurrent jobs and threads to load and memory
+GOVERNOR_ENABLED = False
+GOVERNOR_MIN_JOBS = 1
+GOVERNOR_MAX_JOBS = None         # None = the number of workers
+GOVERNOR_MIN_THREADS = 1
+GOVERNOR_MAX_THREADS = 8         # whisper.cpp gains little from more threads per process
+GOVERNOR_MIN_FREE_MB = 1024      # Pause new jobs while one would leave less memory available
+GOVERNOR_HIGH_LOAD = 1.25        # Remove a job slot above this 1-minute load per core
+GOVERNOR_LOW_LOAD = 0.75         # Add a job slot below this load per core
+GOVERNOR_INTERVAL_SECONDS = 10
+GOVERNOR_MAX_PAUSE_SECONDS = 300  # Start a job anyway when nothing else runs after this long
+GOVERNOR_LOG = None              # JSON lines file with every governor decision, or None
@@ -0,0 +1,107 @@
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+from config import DECODE_PREFETCH, DECODE_TEMP_BUDGET_MB
+from audio_processor import convert_mp3_to_wav, is_cached
+from media_probe import is_whisper_ready, probe
+
+_END = object()
+
+class DecodePipeline:
+    """
+    Producer stage for batch runs: converts the upcoming audio files to 16 kHz mono WAV
+    in a background thread while the current files are being transcribed.
+    At most `prefetch` decoded files wait in the queue, and decoding pauses while
+    the prefetched WAVs use more than `max_temp_bytes` of disk.
+    When disabled (streaming mode), files are handed out undecoded.
+    """
+    
+    def __init__(self, mp3_paths: List[Path], prefetch: int = DECODE_PREFETCH,
+                 max_temp_bytes: int = DECODE_TEMP_BUDGET_MB * 1024 * 1024,
+                 enabled: bool = True):
+        self.mp3_paths = mp3_paths
+        self.enabled = enabled
+        self.max_temp_bytes = max_temp_bytes
+        self.queue = queue.Queue(maxsize=max(1, prefetch))
+        self.bytes_in_use = 0
+        self.wait_seconds = 0.0  # Time consumers spent waiting on decode
+        self._budget = threading.Condition()
+        self._stop = threading.Event()
+        self._tmpdir = None
+        self._thread = None
+    
+    def __enter__(self):
+        self._tmpdir = tempfile.mkdtemp(prefix="whispsub-decode-")
+        self._thread = threading.Thread(target=self._decode_all, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        with self._budget:
+            self._budget.notify_all()
+        # Drain so the producer is never stuck on a full queue
+        while self._thread.is_alive():
+            try:
+                self.queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+    
+    def _wait_for_budget(self):
+        """Block while prefetched WAVs exceed the temp-disk budget (always allow one)."""
+        with self._budget:
+            while (self.bytes_in_use > 0 and self.bytes_in_use >= self.max_temp_bytes
+                   and not self._stop.is_set()):
+                self._budget.wait()
+    
+    def _decode_all(self):
+        for index, mp3_path in enumerate(self.mp3_paths):
+            # Cached transcripts need no audio at all, and 16 kHz mono WAVs are used as they are
+            if not self.enabled or is_cached(mp3_path) or is_whisper_ready(probe(mp3_path)):
+                self.queue.put((index, None))
+                continue
+            
+            self._wait_for_budget()
+            if self._stop.is_set():
+                break
+            
+            wav_path = Path(self._tmpdir) / f"{index:06d}.wav"
+            if convert_mp3_to_wav(mp3_path, wav_path):
+                with self._budget:
+                    self.bytes_in_use += wav_path.stat().st_size
+                self.queue.put((index, wav_path))
+            else:
+                self.queue.put((index, None))
+        self.queue.put(_END)
+    
+    def get(self) -> Optional[Tuple[int, Optional[Path]]]:
+        """
+        Get the next decoded file as (index, wav_path), or None when all files are done.
+        wav_path is None if the pipeline is disabled, the transcript is cached
+        or decoding that file failed.
+        Safe to call from several workers.
+        """
+        start = time.monotonic()
+        item = self.queue.get()
+        with self._budget:
+            self.wait_seconds += time.monotonic() - start
+        
+        if item is _END:
+            self.queue.put(_END)  # Let the other consumers see the end too
+            return None
+        return item
+    
+    def release(self, wav_path: Optional[Path]):
+        """Delete a transcribed WAV and return its space to the budget."""
+        if wav_path is None or not wav_path.exists():
+            return
+        size = wav_path.stat().st_size
+        wav_path.unlink()
+        with self._budget:
+            self.bytes_in_use -= size
+            self._budget.notify_all()
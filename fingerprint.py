@@ -0,0 +1,164 @@
+import os
+import subprocess
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import (
+    FINGERPRINT_SECONDS, FINGERPRINT_CACHE_DIR, DEDUP_MAX_BIT_ERROR,
+    DEDUP_MAX_OFFSET_SECONDS, DEDUP_DURATION_TOLERANCE_SECONDS
+)
+from process_runner import PIPE, get_runner
+from transcript_cache import get_cache
+
+# Fingerprints are computed on 8 kHz audio: 256 ms frames every 32 ms, and
+# 33 log-spaced bands from 300 to 2000 Hz give one 32-bit hash per frame
+SAMPLE_RATE = 8000
+FRAME = 2048
+HOP = 256
+BANDS = 33
+MIN_HZ, MAX_HZ = 300, 2000
+HOP_MS = HOP * 1000 // SAMPLE_RATE
+
+# Candidate pairs need this many identical frame hashes at the same offset
+MIN_VOTES = 10
+
+# Hashes shared by more files than this (silence, jingles) are not used to find candidates
+MAX_FILES_PER_HASH = 20
+
+# A duplicate is (representative, offset_ms): the same audio starts offset_ms later in the duplicate
+Duplicate = Tuple[Path, int]
+
+def decode(audio_path: Path, seconds: float = FINGERPRINT_SECONDS) -> Optional[np.ndarray]:
+    """Decode the start of a file to 8 kHz mono samples."""
+    cmd = [
+        "ffmpeg", "-v", "error",
+        "-t", str(seconds),
+        "-i", str(audio_path),
+        "-map", "0:a:0",
+        "-ar", str(SAMPLE_RATE),
+        "-ac", "1",
+        "-f", "s16le",
+        "pipe:1"
+    ]
+    try:
+        pcm = get_runner().run(cmd, stdout=PIPE, check=True).stdout
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+    return np.frombuffer(pcm, dtype=np.int16)
+
+def compute(samples: np.ndarray) -> np.ndarray:
+    """
+    One 32-bit hash per frame: the signs of the band energy differences
+    between neighbouring bands, compared with the previous frame.
+    """
+    if len(samples) < FRAME + HOP:
+        return np.zeros(0, dtype=np.uint32)
+    
+    frames = np.lib.stride_tricks.sliding_window_view(samples.astype(np.float32), FRAME)[::HOP]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(FRAME), axis=1)) ** 2
+    
+    edges = np.geomspace(MIN_HZ, MAX_HZ, BANDS + 1) * FRAME / SAMPLE_RATE
+    energy = np.add.reduceat(spectrum, edges.astype(int), axis=1)[:, :BANDS]
+    
+    band_diff = energy[:, :-1] - energy[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    return (bits.astype(np.uint64) << np.arange(32, dtype=np.uint64)).sum(axis=1).astype(np.uint32)
+
+def fingerprint(audio_path: Path) -> Optional[Tuple[np.ndarray, float]]:
+    """(hashes, duration in seconds) for a file, cached by audio content."""
+    cache_path = FINGERPRINT_CACHE_DIR / f"{get_cache().audio_hash(audio_path)}-{FINGERPRINT_SECONDS}.npz"
+    try:
+        with np.load(cache_path) as cached:
+            return cached['hashes'], float(cached['duration'])
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    samples = decode(audio_path)
+    if samples is None:
+        return None
+    if len(samples) < FINGERPRINT_SECONDS * SAMPLE_RATE:
+        duration = len(samples) / SAMPLE_RATE
+    else:
+        from audio_processor import probe_duration
+        duration = probe_duration(audio_path)
+        if duration is None:
+            return None
+    hashes = compute(samples)
+    
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f".{cache_path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(tmp_path, hashes=hashes, duration=duration)
+    os.replace(tmp_path, cache_path)
+    return hashes, duration
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, offset: int) -> float:
+    """Fraction of differing bits where b[i + offset] lines up with a[i]."""
+    start = max(0, -offset)
+    end = min(len(a), len(b) - offset)
+    if end - start <= 0:
+        return 1.0
+    diff = a[start:end] ^ b[start + offset:end + offset]
+    return np.unpackbits(diff.view(np.uint8)).sum() / (32 * (end - start))
+
+def find_duplicates(audio_paths: List[Path], max_bit_error: float = DEDUP_MAX_BIT_ERROR,
+                    workers: Optional[int] = None) -> Dict[Path, Duplicate]:
+    """
+    Group near-duplicate recordings (re-encodes, other bitrates, shifted starts).
+    Returns {duplicate: (representative, offset_ms)}; the largest file of each
+    group is its representative and is not in the result.
+    """
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = list(executor.map(fingerprint, audio_paths))
+    prints = {i: result for i, result in enumerate(results) if result is not None and len(result[0])}
+    
+    # Files sharing identical hashes are candidates
+    index = defaultdict(list)
+    for i, (hashes, _) in prints.items():
+        for value, position in zip(*np.unique(hashes, return_index=True)):
+            if value != 0:
+                index[int(value)].append((i, int(position)))
+    
+    votes = Counter()
+    max_offset = DEDUP_MAX_OFFSET_SECONDS * 1000 // HOP_MS
+    for entries in index.values():
+        if len(entries) > MAX_FILES_PER_HASH:
+            continue
+        for n, (i, position_i) in enumerate(entries):
+            for j, position_j in entries[n + 1:]:
+                if abs(position_j - position_i) <= max_offset:
+                    votes[(i, j, position_j - position_i)] += 1
+    
+    # Verify the candidates: (i, j, offset) means j's audio is offset frames later than i's
+    edges = defaultdict(dict)
+    for (i, j, offset), count in votes.most_common():
+        if count < MIN_VOTES or j in edges[i]:
+            continue
+        (hashes_i, duration_i), (hashes_j, duration_j) = prints[i], prints[j]
+        offset_seconds = offset * HOP_MS / 1000
+        if abs(duration_j - duration_i - offset_seconds) > DEDUP_DURATION_TOLERANCE_SECONDS:
+            continue
+        if bit_error_rate(hashes_i, hashes_j, offset) <= max_bit_error:
+            edges[i][j] = offset
+            edges[j][i] = -offset
+    
+    # Walk each group from its largest file, accumulating offsets
+    duplicates = {}
+    seen = set()
+    for i in sorted(edges, key=lambda i: -audio_paths[i].stat().st_size):
+        if i in seen or not edges[i]:
+            continue
+        offsets = {i: 0}
+        stack = [i]
+        while stack:
+            current = stack.pop()
+            for neighbour, offset in edges[current].items():
+                if neighbour not in offsets:
+                    offsets[neighbour] = offsets[current] + offset
+                    stack.append(neighbour)
+        seen.update(offsets)
+        for member, offset in offsets.items():
+            if member != i:
+                duplicates[audio_paths[member]] = (audio_paths[i], offset * HOP_MS)
+    return duplicates
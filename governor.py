@@ -0,0 +1,272 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+from config import (
+    BATCH_WORKERS, GOVERNOR_ENABLED, GOVERNOR_MIN_JOBS, GOVERNOR_MAX_JOBS,
+    GOVERNOR_MIN_THREADS, GOVERNOR_MAX_THREADS, GOVERNOR_MIN_FREE_MB,
+    GOVERNOR_HIGH_LOAD, GOVERNOR_LOW_LOAD, GOVERNOR_INTERVAL_SECONDS,
+    GOVERNOR_MAX_PAUSE_SECONDS, GOVERNOR_LOG
+)
+
+MB = 1024 * 1024
+
+# Until a transcriber's peak RSS was measured, a job is assumed to need the model's
+# size plus this much (whisper.cpp's buffers and the decoded audio)
+JOB_MEMORY_OVERHEAD = 512 * MB
+
+def read_loadavg() -> float:
+    """1-minute load average."""
+    with open("/proc/loadavg") as f:
+        return float(f.read().split()[0])
+
+def read_meminfo() -> Dict[str, int]:
+    """/proc/meminfo fields in bytes."""
+    fields = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            parts = value.split()
+            if parts:
+                fields[name] = int(parts[0]) * (1024 if parts[1:] == ["kB"] else 1)
+    return fields
+
+def read_rss(pid: int) -> Optional[Dict[str, int]]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process in bytes, if it still runs."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    try:
+        return {
+            'rss': int(fields['VmRSS'].split()[0]) * 1024,
+            'peak': int(fields['VmHWM'].split()[0]) * 1024,
+        }
+    except (KeyError, ValueError, IndexError):
+        return None
+
+class ResourceGovernor:
+    """
+    Admission control for transcription jobs on machines shared with other services.
+    A monitor thread samples the load average, available memory and the RSS of the
+    running transcriber processes from /proc. Every GOVERNOR_INTERVAL_SECONDS it adds
+    a job slot while the machine has idle cores and room for another transcriber, and
+    removes one while the load is above the number of cores. New jobs wait for a free
+    slot, and are paused while starting one would leave less than min_free memory.
+    Each job gets the cores not used by others, split between the job slots, as threads.
+    Decisions are printed and, with GOVERNOR_LOG, appended to a JSON lines file.
+    """
+    
+    def __init__(self, min_jobs: int = GOVERNOR_MIN_JOBS, max_jobs: Optional[int] = GOVERNOR_MAX_JOBS,
+                 min_threads: int = GOVERNOR_MIN_THREADS, max_threads: int = GOVERNOR_MAX_THREADS,
+                 min_free: int = GOVERNOR_MIN_FREE_MB * MB, interval: float = GOVERNOR_INTERVAL_SECONDS,
+                 log_path: Optional[Path] = GOVERNOR_LOG):
+        self.max_jobs = max(1, max_jobs or BATCH_WORKERS)
+        self.min_jobs = max(1, min(min_jobs, self.max_jobs))
+        self.min_threads = max(1, min_threads)
+        self.max_threads = max(self.min_threads, max_threads)
+        self.min_free = min_free
+        self.interval = interval
+        self.log_path = log_path
+        self.cores = os.cpu_count() or 1
+        self.limit = self.min_jobs  # Start low and add jobs while the machine has room
+        self.running: Dict[int, int] = {}  # job id -> threads
+        self.waiting = 0
+        self.job_memory: Optional[int] = None  # Peak RSS of one transcriber, once measured
+        self.model_memory = 0
+        self.sample: Dict = {}
+        self.paused = False
+        self._next_id = 0
+        self._cond = threading.Condition()
+        self._monitor: Optional[threading.Thread] = None
+        self.take_sample()
+    
+    def set_model(self, model_path: Optional[Path]):
+        """Estimate job memory from the model's size until a transcriber was measured."""
+        try:
+            self.model_memory = Path(model_path).stat().st_size if model_path else 0
+        except OSError:
+            self.model_memory = 0
+    
+    def estimated_job_memory(self) -> int:
+        if self.job_memory is not None:
+            return self.job_memory
+        return self.model_memory + JOB_MEMORY_OVERHEAD if self.model_memory else 0
+    
+    def take_sample(self) -> Dict:
+        """Read load, memory and transcriber RSS from /proc."""
+        from process_runner import get_runner
+        
+        meminfo = read_meminfo()
+        rss = [r for r in map(read_rss, get_runner().transcriber_pids.copy()) if r is not None]
+        if rss:
+            peak = max(r['peak'] for r in rss)
+            self.job_memory = max(self.job_memory or 0, peak)
+        self.sample = {
+            'load': read_loadavg(),
+            'available': meminfo.get('MemAvailable', meminfo.get('MemFree', 0)),
+            'total': meminfo.get('MemTotal', 0),
+            'transcriber_rss': sum(r['rss'] for r in rss),
+            'transcribers': len(rss),
+        }
+        return self.sample
+    
+    def log(self, event: str, message: str, **fields):
+        print(f"🎛️  Governor: {message}")
+        if self.log_path is None:
+            return
+        record = {'time': time.time(), 'event': event, 'limit': self.limit,
+                  'running': len(self.running), 'waiting': self.waiting, **self.sample, **fields}
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+    
+    def describe(self) -> str:
+        s = self.sample
+        return (f"load {s['load']:.1f}/{self.cores} cores, {s['available'] / 2**30:.1f} GB available, "
+                f"~{self.estimated_job_memory() / 2**30:.1f} GB per job")
+    
+    def memory_pressure(self) -> bool:
+        """Starting another job would leave less than min_free memory available."""
+        return self.sample['available'] - self.estimated_job_memory() < self.min_free
+    
+    def adjust(self):
+        """Raise or lower the job limit from the latest sample. Called with the lock held."""
+        load = self.sample['load']
+        previous = self.limit
+        if load > self.cores * GOVERNOR_HIGH_LOAD and self.limit > self.min_jobs:
+            self.limit -= 1
+            reason = "machine overloaded"
+        elif (load < self.cores * GOVERNOR_LOW_LOAD and self.limit < self.max_jobs
+              and self.waiting and len(self.running) >= self.limit and not self.memory_pressure()):
+            self.limit += 1
+            reason = "idle cores and memory for another job"
+        else:
+            return
+        self.log('limit', f"jobs {previous} → {self.limit} ({reason}; {self.describe()})",
+                 previous=previous, reason=reason)
+    
+    def threads_per_job(self) -> int:
+        """Cores not busy with other work, split between the job slots."""
+        ours = sum(self.running.values())
+        other_load = max(0.0, self.sample['load'] - ours)
+        usable = max(1, int(round(self.cores - other_load)))
+        return max(self.min_threads, min(self.max_threads, usable // self.limit))
+    
+    def _monitor_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.take_sample()
+            except OSError:
+                continue
+            with self._cond:
+                self.adjust()
+                self._cond.notify_all()
+                if not self.running and not self.waiting:
+                    self._monitor = None  # Started again by the next admission
+                    return
+    
+    def _ensure_monitor(self):
+        if self._monitor is None:
+            self._monitor = threading.Thread(target=self._monitor_loop, name="governor", daemon=True)
+            self._monitor.start()
+    
+    @contextmanager
+    def admit(self, label: str):
+        """
+        Wait until a job may start and yield the number of threads it should use.
+        Under memory pressure the job waits (at most GOVERNOR_MAX_PAUSE_SECONDS when
+        nothing else of ours is running, so the run can't stall forever).
+        """
+        with self._cond:
+            self._ensure_monitor()
+            self.waiting += 1
+            paused_at = None
+            try:
+                while True:
+                    if len(self.running) < self.limit:
+                        if not self.memory_pressure():
+                            break
+                        if paused_at is None:
+                            paused_at = time.monotonic()
+                            self.paused = True
+                            self.log('pause', f"pausing {label}: memory pressure ({self.describe()})",
+                                     job=label)
+                        elif not self.running and time.monotonic() - paused_at > GOVERNOR_MAX_PAUSE_SECONDS:
+                            self.log('force', f"starting {label} despite memory pressure after "
+                                              f"{GOVERNOR_MAX_PAUSE_SECONDS:.0f}s ({self.describe()})", job=label)
+                            self.paused = False
+                            break
+                    self._cond.wait(self.interval)
+                    try:
+                        self.take_sample()
+                    except OSError:
+                        pass
+            finally:
+                self.waiting -= 1
+            if paused_at is not None and self.paused:
+                self.paused = False
+                self.log('resume', f"resuming after {time.monotonic() - paused_at:.0f}s ({self.describe()})",
+                         job=label)
+            threads = self.threads_per_job()
+            job_id = self._next_id
+            self._next_id += 1
+            self.running[job_id] = threads
+        try:
+            yield threads
+        finally:
+            with self._cond:
+                self.running.pop(job_id, None)
+                self._cond.notify_all()
+
+_governor: Optional[ResourceGovernor] = None
+_governor_enabled = GOVERNOR_ENABLED
+_governor_lock = threading.Lock()
+
+def configure_governor(enabled: bool, max_jobs: Optional[int] = None):
+    """Turn the governor on or off, e.g. from the command line (max_jobs: the worker count)."""
+    global _governor, _governor_enabled
+    with _governor_lock:
+        _governor_enabled = enabled
+        _governor = None
+        if enabled and max_jobs is not None:
+            _governor = _create(max_jobs)
+
+def _create(max_jobs: Optional[int] = None) -> Optional[ResourceGovernor]:
+    try:
+        return ResourceGovernor(max_jobs=max_jobs or GOVERNOR_MAX_JOBS)
+    except OSError:
+        print("⚠️  The resource governor needs /proc (Linux); running without it")
+        return None
+
+def get_governor() -> Optional[ResourceGovernor]:
+    """The shared governor, or None if it is disabled or unsupported here."""
+    global _governor, _governor_enabled
+    with _governor_lock:
+        if _governor is None and _governor_enabled:
+            _governor = _create()
+            _governor_enabled = _governor is not None
+        return _governor
+
+@contextmanager
+def admitted(label: str, threads: Optional[int] = None, model_path: Optional[Path] = None):
+    """
+    Run a job under the governor if it is enabled; yields the threads to use.
+    model_path is the model a new transcriber process loads (None if jobs share
+    an already running server).
+    """
+    governor = get_governor()
+    if governor is None:
+        yield threads
+        return
+    governor.set_model(model_path)
+    with governor.admit(label) as governed_threads:
+        yield governed_threads
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import JOURNAL_DIR
+from subtitle_writer import subtitle_path
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class JobJournal:
+    """
+    Append-only JSONL journal of a batch run over one folder.
+    Each line is an event for one file: 'start', 'done' (with the input's mtime/size
+    and the checksum of every output) or 'failed'. The last event per file wins.
+    """
+    
+    def __init__(self, folder_path: Path, journal_dir: Path = JOURNAL_DIR):
+        self.folder_path = folder_path
+        folder_id = hashlib.sha1(str(folder_path.resolve()).encode()).hexdigest()[:16]
+        self.path = journal_dir / f"{folder_id}.jsonl"
+        self.state: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """Read the last recorded event for every file."""
+        self.state = {}
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from a crash
+                self.state[event['file']] = event
+    
+    def reset(self):
+        """Start a fresh journal for a new (non-resumed) run."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+            self.state = {}
+    
+    def _append(self, event: Dict):
+        event['time'] = time.time()
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.state[event['file']] = event
+    
+    def record_start(self, mp3_file: str):
+        self._append({'file': mp3_file, 'event': 'start'})
+    
+    def record_done(self, mp3_file: str, formats: List[str]):
+        mp3_path = self.folder_path / mp3_file
+        st = mp3_path.stat()
+        outputs = {}
+        for fmt in formats:
+            output_path = subtitle_path(mp3_path, fmt)
+            if output_path.exists():
+                outputs[fmt] = file_checksum(output_path)
+        self._append({
+            'file': mp3_file,
+            'event': 'done',
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'outputs': outputs,
+        })
+    
+    def record_failed(self, mp3_file: str):
+        self._append({'file': mp3_file, 'event': 'failed'})
+    
+    def has_unfinished(self) -> bool:
+        """Check whether the last run stopped with files in flight or failed."""
+        return any(event['event'] != 'done' for event in self.state.values())
+    
+    def status(self, mp3_file: str, formats: List[str]) -> Optional[str]:
+        """
+        Resume status of a file: 'done' if it completed and neither the input nor the
+        requested outputs changed since, 'redo' if it was started, failed or is stale,
+        or None if this journal has never seen it.
+        """
+        event = self.state.get(mp3_file)
+        if event is None:
+            return None
+        if event['event'] != 'done':
+            return 'redo'
+        
+        mp3_path = self.folder_path / mp3_file
+        try:
+            st = mp3_path.stat()
+        except OSError:
+            return 'redo'
+        if st.st_mtime_ns != event['mtime_ns'] or st.st_size != event['size']:
+            return 'redo'
+        
+        for fmt in formats:
+            output_path = subtitle_path(mp3_path, fmt)
+            expected = event['outputs'].get(fmt)
+            if expected is None or not output_path.exists() or file_checksum(output_path) != expected:
+                return 'redo'
+        return 'done'
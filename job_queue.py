@@ -0,0 +1,271 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from config import QUEUE_DB, QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    formats TEXT NOT NULL,
+    action TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+# A leased job is (id, path, formats, action)
+Job = Tuple[int, Path, List[str], str]
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    """
+    Shared queue of per-file jobs in a SQLite file, so one coordinator can enqueue a
+    library and worker processes on any host that mounts the same storage can share it.
+    Workers lease a job for lease_seconds and renew the lease while it runs; jobs
+    whose lease expired (crashed or killed worker) are handed out again, up to
+    max_attempts times. Paths are stored absolute, so the library must be mounted
+    at the same path on every host.
+    """
+    
+    def __init__(self, db_path: Path = QUEUE_DB, lease_seconds: float = QUEUE_LEASE_SECONDS,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: safe across threads and processes.
+        # The rollback journal (not WAL) is used because WAL needs shared memory,
+        # which network filesystems don't provide.
+        db = sqlite3.connect(str(self.db_path), timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")  # Take the write lock up front
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+    
+    def enqueue(self, jobs: List[Tuple[Path, List[str], str]]) -> int:
+        """
+        Add (path, formats, action) jobs. Files already queued or running are left
+        alone; finished or failed ones are queued again. Returns the number queued.
+        """
+        now = time.time()
+        queued = 0
+        with self._transaction() as db:
+            for path, formats, action in jobs:
+                cursor = db.execute(
+                    "INSERT INTO jobs (path, formats, action, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET formats = excluded.formats, action = excluded.action, "
+                    "status = 'queued', worker = NULL, lease_expires = NULL, attempts = 0, error = NULL, "
+                    "updated = excluded.updated WHERE jobs.status IN ('done', 'failed')",
+                    (str(path), ",".join(formats), action, now)
+                )
+                queued += cursor.rowcount
+        return queued
+    
+    def lease(self, worker: str) -> Optional[Job]:
+        """Lease the next queued (or expired) job, or return None if there is none."""
+        now = time.time()
+        with self._transaction() as db:
+            # Expired leases that used up their attempts have failed for good
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired', updated = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts)
+            )
+            row = db.execute(
+                "SELECT id, path, formats, action FROM jobs "
+                "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row[0])
+            )
+        job_id, path, formats, action = row
+        return job_id, Path(path), formats.split(","), action
+    
+    def renew(self, job_ids: List[int], worker: str) -> int:
+        """Extend the leases this worker still holds. Returns how many were renewed."""
+        if not job_ids:
+            return 0
+        now = time.time()
+        placeholders = ",".join("?" * len(job_ids))
+        with self._transaction() as db:
+            return db.execute(
+                f"UPDATE jobs SET lease_expires = ?, updated = ? "
+                f"WHERE status = 'leased' AND worker = ? AND id IN ({placeholders})",
+                (now + self.lease_seconds, now, worker, *job_ids)
+            ).rowcount
+    
+    def finish(self, job_id: int, worker: str, success: bool, error: Optional[str] = None) -> bool:
+        """
+        Report the result of a leased job. Returns False if the lease was lost
+        (it expired and another worker took the job over).
+        """
+        with self._transaction() as db:
+            return db.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                ('done' if success else 'failed', error, time.time(), job_id, worker)
+            ).rowcount == 1
+    
+    def release(self, job_id: int, worker: str):
+        """Give a job back without counting the attempt (e.g. on shutdown)."""
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires = NULL, "
+                "attempts = attempts - 1, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), job_id, worker)
+            )
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status ('queued', 'leased', 'done', 'failed')."""
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+    
+    def failures(self, limit: int = 10) -> List[Tuple[str, Optional[str]]]:
+        with self._connect() as db:
+            return db.execute(
+                "SELECT path, error FROM jobs WHERE status = 'failed' ORDER BY updated DESC LIMIT ?", (limit,)
+            ).fetchall()
+    
+    def pending(self) -> int:
+        """Jobs that are queued or still running somewhere."""
+        counts = self.counts()
+        return counts.get('queued', 0) + counts.get('leased', 0)
+
+class QueueWorker:
+    """
+    Worker process for a JobQueue: worker threads lease jobs and run generate_subtitles,
+    while a heartbeat thread renews the leases of the running jobs.
+    """
+    
+    def __init__(self, job_queue: JobQueue, workers: int = 1, wait: bool = False,
+                 poll_seconds: float = 5.0):
+        self.queue = job_queue
+        self.workers = max(1, workers)
+        self.wait = wait  # Keep polling for new jobs instead of exiting when the queue is empty
+        self.poll_seconds = poll_seconds
+        self.worker = worker_id()
+        self.stats = {'processed': 0, 'failed': 0, 'lost': 0}
+        self.running: Dict[int, Path] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            with self._lock:
+                job_ids = list(self.running)
+            try:
+                self.queue.renew(job_ids, self.worker)
+            except sqlite3.Error as e:
+                print(f"⚠️  Could not renew leases: {e}")
+    
+    def work(self, threads: int):
+        from audio_processor import generate_subtitles
+        from metrics import get_metrics
+        from process_runner import Cancelled, get_runner
+        
+        while not self._stop.is_set():
+            job = self.queue.lease(self.worker)
+            if job is None:
+                if not self.wait and self.queue.pending() == 0:
+                    return
+                self._stop.wait(self.poll_seconds)  # Others may still fail and hand jobs back
+                continue
+            
+            job_id, path, formats, action = job
+            with self._lock:
+                self.running[job_id] = path
+            print(f"🎧 [{self.worker}] {path}")
+            error = None
+            try:
+                success = generate_subtitles(path, formats, action=action, threads=threads)
+                if not success:
+                    error = "transcription failed"
+            except Cancelled:
+                self.queue.release(job_id, self.worker)
+                return
+            except Exception as e:
+                print(f"❌ Error processing {path}: {e}")
+                success, error = False, str(e)
+            finally:
+                with self._lock:
+                    self.running.pop(job_id, None)
+                get_metrics().discard(path)
+            
+            if not success and get_runner().cancelled:
+                self.queue.release(job_id, self.worker)
+                return
+            if not self.queue.finish(job_id, self.worker, success, error):
+                outcome = 'lost'
+                print(f"   ⚠️  Lease on {path.name} expired, result not recorded")
+            else:
+                outcome = 'processed' if success else 'failed'
+            with self._lock:
+                self.stats[outcome] += 1
+            print(f"   {'✅' if success else '❌'} {path.name} "
+                  f"({self.stats['processed']} done, {self.stats['failed']} failed)")
+    
+    def run(self):
+        """Process jobs until the queue is drained (or stop() is called / Ctrl-C)."""
+        from process_runner import get_runner
+        
+        get_runner().allow_transcribers(self.workers)  # Cores are split between all workers
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        pool = [threading.Thread(target=self.work, args=(threads,), daemon=True) for _ in range(self.workers)]
+        beat = threading.Thread(target=self.heartbeat, daemon=True)
+        beat.start()
+        for thread in pool:
+            thread.start()
+        
+        print(f"🛠️  Worker {self.worker} on {self.queue.db_path} ({self.workers} workers)")
+        try:
+            for thread in pool:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\n🛑 Interrupted, handing running jobs back to the queue...")
+            self._stop.set()
+            get_runner().cancel_all()
+            for thread in pool:
+                thread.join()
+            raise
+        finally:
+            self._stop.set()
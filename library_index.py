@@ -0,0 +1,160 @@
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from config import LIBRARY_INDEX_PATH
+from subtitle_writer import SUBTITLE_FORMATS
+
+# Audio files, and video containers whose first audio track is transcribed
+AUDIO_EXTENSIONS = {
+    ".mp3", ".wav", ".flac", ".m4a", ".aac", ".ogg", ".oga", ".opus", ".wma",
+    ".mp4", ".m4v", ".mkv", ".webm", ".mov", ".avi",
+}
+
+# Coarsest directory mtime resolution to expect (FAT/exFAT: 2 s; some NFS/SMB mounts: 1 s).
+# A listing taken within this of the directory's mtime may miss a change made in the same
+# tick, which leaves the mtime as it is, so such "racily clean" entries are never reused.
+MTIME_GRANULARITY_NS = 2_000_000_000
+
+class LibraryIndex:
+    """
+    Cached index of the music library.
+    Each directory is listed with a single os.scandir pass, recording its subfolders,
+    audio files and the subtitle formats that exist for each audio stem. Entries are
+    keyed by the directory's mtime, so a rescan only re-lists directories that changed;
+    unchanged ones cost one stat. An entry listed too soon after the directory changed
+    is re-listed on its next use (see MTIME_GRANULARITY_NS). The index is persisted
+    between runs.
+    """
+    
+    def __init__(self, index_path: Optional[Path] = LIBRARY_INDEX_PATH):
+        self.index_path = index_path
+        self.dirs: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+        self.load()
+    
+    def load(self):
+        if self.index_path is None or not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Listings made with other audio extensions are missing files; rescan them
+        if isinstance(data, dict) and data.get('audio_extensions') == sorted(AUDIO_EXTENSIONS):
+            self.dirs = data['dirs']
+    
+    def save(self):
+        """Write the index to disk if it changed."""
+        with self._lock:
+            if self.index_path is None or not self._dirty:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'audio_extensions': sorted(AUDIO_EXTENSIONS), 'dirs': self.dirs}, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+    
+    def _scan(self, directory: Path, mtime_ns: int) -> Dict:
+        """List one directory with a single scandir pass."""
+        subdirs, audio, subtitles = [], [], {}
+        scanned_ns = time.time_ns()  # Before listing: later changes must not look older than the listing
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                        continue
+                except OSError:
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                ext = ext.lower()
+                if ext in AUDIO_EXTENSIONS:
+                    audio.append(entry.name)
+                elif ext[1:] in SUBTITLE_FORMATS:
+                    subtitles.setdefault(stem, []).append(ext[1:])
+        
+        subdirs.sort()
+        audio.sort()
+        return {'mtime_ns': mtime_ns, 'scanned_ns': scanned_ns, 'subdirs': subdirs, 'audio': audio,
+                'subtitles': subtitles}
+    
+    @staticmethod
+    def is_current(entry: Optional[Dict], mtime_ns: int) -> bool:
+        """Whether an entry still lists the directory: same mtime, and not listed in the same mtime tick."""
+        return (entry is not None and entry['mtime_ns'] == mtime_ns
+                and entry.get('scanned_ns', 0) - mtime_ns >= MTIME_GRANULARITY_NS)
+    
+    def directory(self, directory: Path) -> Dict:
+        """Get the index entry for a directory, re-listing it only if it may have changed."""
+        key = str(directory)
+        try:
+            mtime_ns = directory.stat().st_mtime_ns
+        except OSError:
+            with self._lock:
+                if self.dirs.pop(key, None) is not None:
+                    self._dirty = True
+            return {'mtime_ns': 0, 'subdirs': [], 'audio': [], 'subtitles': {}}
+        
+        with self._lock:
+            entry = self.dirs.get(key)
+            if self.is_current(entry, mtime_ns):
+                return entry
+        
+        entry = self._scan(directory, mtime_ns)
+        with self._lock:
+            self.dirs[key] = entry
+            self._dirty = True
+        return entry
+    
+    def list_folders(self, directory: Path) -> List[str]:
+        return list(self.directory(directory)['subdirs'])
+    
+    def list_audio_files(self, directory: Path) -> List[str]:
+        return list(self.directory(directory)['audio'])
+    
+    def subtitle_formats(self, audio_path: Path) -> List[str]:
+        """Subtitle formats that exist next to an audio file."""
+        return list(self.directory(audio_path.parent)['subtitles'].get(audio_path.stem, []))
+    
+    def walk_audio_files(self, root: Path) -> Iterator[Path]:
+        """Yield every audio file below root (recursively), in sorted order."""
+        seen = set()
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            real = os.path.realpath(directory)
+            if real in seen:
+                continue  # Symlink loop
+            seen.add(real)
+            
+            entry = self.directory(directory)
+            for name in entry['audio']:
+                yield directory / name
+            stack.extend(directory / name for name in reversed(entry['subdirs']))
+    
+    def scan(self, root: Path) -> int:
+        """Refresh the index below root and persist it. Returns the number of audio files."""
+        count = sum(1 for _ in self.walk_audio_files(root))
+        self.save()
+        return count
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index() -> LibraryIndex:
+    """Get the shared library index (loaded on first use, saved at exit)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LibraryIndex()
+            atexit.register(_index.save)
+        return _index
@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
-WhispSub - Generate subtitles from MP3 files using Whisper
+WhispSub - Generate subtitles from audio files using Whisper
 Refactored version with modular components and batch processing
 """
 
-from pathlib import Path
-from prerequisites import check_prerequisites
-from user_selection import select_music_file
-from audio_processor import generate_subtitles
-from batch_processor import batch_process_folder
+import sys
 
 def main():
     """Main application entry point."""
+    # Imported here so headless runs (cli.py) never load the interactive prompt stack
+    from prerequisites import check_prerequisites
+    from user_selection import select_music_file
+    from audio_processor import generate_subtitles
+    from batch_processor import batch_process_folder
+    
     # Check prerequisites
     if not check_prerequisites():
         return
@@ -22,12 +24,12 @@ def main():
         print("Operation cancelled.")
         return
     
-    target_path, subtitle_format, processing_mode = selection
+    target_path, subtitle_formats, processing_mode = selection
     
     if processing_mode == 'single':
         # Single file processing
         print(f"\n🎯 Processing single file: {target_path.name}")
-        success = generate_subtitles(target_path, subtitle_format)
+        success = generate_subtitles(target_path, subtitle_formats)
         
         if success:
             print("\n🎉 Subtitle generation completed successfully!")
@@ -37,7 +39,7 @@ def main():
     elif processing_mode == 'batch':
         # Batch processing
         print(f"\n🎯 Starting batch processing of folder: {target_path}")
-        results = batch_process_folder(target_path, subtitle_format)
+        results = batch_process_folder(target_path, subtitle_formats)
         
         if results['processed'] > 0:
             print("\n🎉 Batch processing completed!")
@@ -45,4 +47,13 @@ def main():
             print("\n⚠️  No files were processed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Headless mode: python main.py run PATH ... (see cli.py)
+        from cli import run
+        sys.exit(run(sys.argv[1:]))
+    try:
+        main()
+    except KeyboardInterrupt:
+        # Running ffmpeg/whisper-cli processes are killed by the process runner
+        print("\n❌ Interrupted.")
+        sys.exit(130)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import atexit
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import MEDIA_PROBE_CACHE
+from process_runner import PIPE, get_runner
+
+# What whisper.cpp reads without conversion: 16 kHz mono 16-bit PCM WAV
+WHISPER_SAMPLE_RATE = 16000
+
+# WAV format tag of plain PCM; WAVE_FORMAT_EXTENSIBLE (0xfffe) files are decoded, since
+# the wave module (used for VAD, long files and tiering) can't read them before Python 3.12
+WAVE_FORMAT_PCM = "0x0001"
+
+def run_ffprobe(media_path: Path) -> Optional[Dict]:
+    """
+    Container and first audio stream of a file, as a dict:
+    {'format': 'mov,mp4,...', 'duration': seconds or None, 'video': bool,
+     'audio': {'codec', 'tag', 'sample_rate', 'channels'} or None if there is no audio stream}.
+    Returns None if ffprobe can't read the file.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=format_name,duration:stream=codec_type,codec_name,codec_tag,sample_rate,channels",
+        "-of", "json",
+        str(media_path)
+    ]
+    try:
+        probe = json.loads(get_runner().run(cmd, stdout=PIPE, check=True).stdout)
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError):
+        return None
+    
+    streams = probe.get('streams', [])
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    try:
+        duration = float(probe.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    return {
+        'format': probe.get('format', {}).get('format_name', ''),
+        'duration': duration,
+        'video': any(s.get('codec_type') == 'video' for s in streams),
+        'audio': None if audio is None else {
+            'codec': audio.get('codec_name'),
+            'tag': audio.get('codec_tag'),
+            'sample_rate': int(audio.get('sample_rate') or 0),
+            'channels': int(audio.get('channels') or 0),
+        },
+    }
+
+def is_whisper_ready(info: Optional[Dict]) -> bool:
+    """Whether the file can be handed to whisper.cpp as it is (16 kHz mono 16-bit PCM WAV)."""
+    if not info or info['format'] != 'wav' or info['audio'] is None:
+        return False
+    audio = info['audio']
+    return (audio['codec'] == 'pcm_s16le' and audio.get('tag') == WAVE_FORMAT_PCM
+            and audio['sample_rate'] == WHISPER_SAMPLE_RATE and audio['channels'] == 1)
+
+class ProbeCache:
+    """
+    ffprobe results by file, persisted between runs. An entry is reused while the
+    file's mtime and size are unchanged, so every file is probed once.
+    """
+    
+    def __init__(self, cache_path: Optional[Path] = MEDIA_PROBE_CACHE):
+        self.cache_path = cache_path
+        self.entries: Dict[str, List] = {}  # path -> [mtime_ns, size, info]
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+    
+    def load(self):
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+    
+    def save(self):
+        """Write the cache to disk if it changed."""
+        with self._lock:
+            if self.cache_path is None or not self._dirty:
+                return
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+    
+    def probe(self, media_path: Path) -> Optional[Dict]:
+        """Probe result for a file (see run_ffprobe), from the cache while it is current."""
+        try:
+            st = media_path.stat()
+        except OSError:
+            return None
+        key = str(media_path.resolve())
+        with self._lock:
+            entry = self.entries.get(key)
+        # Entries from before the codec tag was probed are probed again
+        if (entry is not None and entry[:2] == [st.st_mtime_ns, st.st_size]
+                and 'tag' in (entry[2]['audio'] or {'tag': None})):
+            return entry[2]
+        
+        info = run_ffprobe(media_path)
+        if info is not None:
+            with self._lock:
+                self.entries[key] = [st.st_mtime_ns, st.st_size, info]
+                self._dirty = True
+        return info
+    
+    def probe_all(self, media_paths: List[Path], workers: Optional[int] = None) -> Dict[Path, Optional[Dict]]:
+        """Probe many files, running ffprobe for the uncached ones in parallel."""
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = dict(zip(media_paths, executor.map(self.probe, media_paths)))
+        self.save()
+        return results
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_probes() -> ProbeCache:
+    """Get the shared probe cache (loaded on first use, saved at exit)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ProbeCache()
+            atexit.register(_cache.save)
+        return _cache
+
+def probe(media_path: Path) -> Optional[Dict]:
+    return get_probes().probe(media_path)
@@ -0,0 +1,206 @@
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import METRICS_JSONL, METRICS_PROMETHEUS
+
+STAGES = ['cache', 'decode', 'vad', 'model_load', 'inference', 'write']
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+class RunMetrics:
+    """
+    Per-file, per-stage timings for one run.
+    Each file record holds the wall and CPU seconds of every stage, the audio duration
+    and the realtime factor. CPU time includes finished child processes (ffmpeg,
+    whisper-cli), so it is approximate when several workers run at once.
+    """
+    
+    def __init__(self, jsonl_path: Optional[Path] = METRICS_JSONL,
+                 prometheus_path: Optional[Path] = METRICS_PROMETHEUS):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.records: Dict[str, Dict] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+    
+    def _record(self, file: Optional[Path] = None) -> Optional[Dict]:
+        if file is None:
+            return getattr(self._local, 'record', None)
+        with self._lock:
+            return self.records.setdefault(str(file), {'file': str(file), 'stages': {}})
+    
+    @contextmanager
+    def track_file(self, mp3_path: Path):
+        """Track one file: stages recorded on this thread are attributed to it."""
+        record = self._record(mp3_path)
+        record['outcome'] = 'failed'
+        previous = getattr(self._local, 'record', None)
+        self._local.record = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall'] = time.perf_counter() - start
+            if record.get('audio_seconds'):
+                record['realtime_factor'] = record['wall'] / record['audio_seconds']
+            self._local.record = previous
+            self._append_jsonl(record)
+    
+    @contextmanager
+    def attach(self, record: Optional[Dict]):
+        """Attribute stages recorded on this thread to an already tracked file record."""
+        previous = getattr(self._local, 'record', None)
+        self._local.record = record
+        try:
+            yield record
+        finally:
+            self._local.record = previous
+    
+    def current(self) -> Optional[Dict]:
+        """The file record tracked on this thread, if any."""
+        return self._record()
+    
+    @contextmanager
+    def stage(self, name: str, file: Optional[Path] = None):
+        """Time a stage for the current file (or the given one)."""
+        wall_start, cpu_start = time.perf_counter(), time.thread_time() + _children_cpu()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - wall_start,
+                           time.thread_time() + _children_cpu() - cpu_start, file)
+    
+    def add_stage(self, name: str, wall: float, cpu: Optional[float] = None, file: Optional[Path] = None):
+        """Add time to a stage of the current file (or the given one)."""
+        record = self._record(file)
+        if record is None:
+            return
+        with self._lock:
+            stage = record['stages'].setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+            stage['wall'] += wall
+            if cpu is not None:
+                stage['cpu'] += cpu
+    
+    def discard(self, file: Path):
+        """Forget a finished file's record (long-running daemons)."""
+        with self._lock:
+            self.records.pop(str(file), None)
+    
+    def set_outcome(self, outcome: str, file: Optional[Path] = None):
+        record = self._record(file)
+        if record is not None:
+            record['outcome'] = outcome
+    
+    def set_audio_duration(self, seconds: Optional[float], file: Optional[Path] = None):
+        record = self._record(file)
+        if record is not None and seconds:
+            record['audio_seconds'] = seconds
+    
+    def _append_jsonl(self, record: Dict):
+        if self.jsonl_path is None:
+            return
+        with self._lock:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(dict(record, time=time.time())) + "\n")
+    
+    def stage_walls(self) -> Dict[str, List[float]]:
+        """Wall seconds of every stage across the finished files."""
+        walls: Dict[str, List[float]] = {}
+        for record in self.records.values():
+            for name, stage in record['stages'].items():
+                walls.setdefault(name, []).append(stage['wall'])
+        return walls
+    
+    def inference_rate(self) -> Optional[float]:
+        """Model load and inference seconds per second of audio, over the transcribed files."""
+        audio = inference = 0.0
+        for record in self.records.values():
+            stages = record['stages']
+            if record.get('audio_seconds') and 'inference' in stages:
+                audio += record['audio_seconds']
+                inference += stages['inference']['wall'] + stages.get('model_load', {}).get('wall', 0.0)
+        return inference / audio if audio else None
+    
+    def summary_lines(self, slowest: int = 3) -> List[str]:
+        """End-of-run summary: p50/p95 per stage, overall realtime factor and slowest files."""
+        finished = [r for r in self.records.values() if 'wall' in r]
+        if not finished:
+            return []
+        
+        lines = ["⏱️  Stage timings (p50 / p95 per file):"]
+        walls = self.stage_walls()
+        for name in STAGES + sorted(set(walls) - set(STAGES)):
+            if name in walls:
+                lines.append(f"   {name:<11} {percentile(walls[name], 0.5):7.2f}s / {percentile(walls[name], 0.95):7.2f}s")
+        
+        audio = sum(r.get('audio_seconds', 0) for r in finished)
+        wall = sum(r['wall'] for r in finished)
+        if audio:
+            lines.append(f"   Audio: {audio / 60:.1f} min, realtime factor {wall / audio:.3f}")
+        
+        lines.append("   Slowest files:")
+        for record in sorted(finished, key=lambda r: r['wall'], reverse=True)[:slowest]:
+            lines.append(f"   • {Path(record['file']).name}: {record['wall']:.1f}s")
+        return lines
+    
+    def write_prometheus(self):
+        """Write the run totals and stage quantiles as a Prometheus textfile (atomically)."""
+        if self.prometheus_path is None:
+            return
+        finished = [r for r in self.records.values() if 'wall' in r]
+        lines = [
+            "# HELP whispsub_files_total Files handled in the last run by outcome.",
+            "# TYPE whispsub_files_total gauge",
+        ]
+        for outcome in ('processed', 'skipped', 'failed'):
+            count = sum(1 for r in finished if r.get('outcome') == outcome)
+            lines.append(f'whispsub_files_total{{outcome="{outcome}"}} {count}')
+        
+        lines += [
+            "# HELP whispsub_audio_seconds_total Seconds of audio transcribed in the last run.",
+            "# TYPE whispsub_audio_seconds_total gauge",
+            f"whispsub_audio_seconds_total {sum(r.get('audio_seconds', 0) for r in finished)}",
+            "# HELP whispsub_stage_seconds_total Wall seconds spent per stage in the last run.",
+            "# TYPE whispsub_stage_seconds_total gauge",
+        ]
+        walls = self.stage_walls()
+        for name, values in sorted(walls.items()):
+            lines.append(f'whispsub_stage_seconds_total{{stage="{name}"}} {sum(values):.3f}')
+        
+        lines += [
+            "# HELP whispsub_stage_seconds Per-file wall seconds per stage in the last run.",
+            "# TYPE whispsub_stage_seconds summary",
+        ]
+        for name, values in sorted(walls.items()):
+            for q in (0.5, 0.95):
+                lines.append(f'whispsub_stage_seconds{{stage="{name}",quantile="{q}"}} {percentile(values, q):.3f}')
+        lines.append(f"whispsub_last_run_timestamp_seconds {time.time():.0f}")
+        
+        tmp_path = self.prometheus_path.with_name(f".{self.prometheus_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp_path, self.prometheus_path)
+
+_metrics = RunMetrics()
+
+def get_metrics() -> RunMetrics:
+    """Get the metrics of the current run."""
+    return _metrics
+
+def start_run(jsonl_path: Optional[Path] = METRICS_JSONL,
+              prometheus_path: Optional[Path] = METRICS_PROMETHEUS) -> RunMetrics:
+    """Start collecting metrics for a new run."""
+    global _metrics
+    _metrics = RunMetrics(jsonl_path, prometheus_path)
+    return _metrics
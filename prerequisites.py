@@ -1,23 +1,103 @@
+import importlib.util
+import json
+import os
+import shutil
 import subprocess
-from config import WHISPER_CLI, WHISPER_MODEL
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from config import (
+    WHISPER_CLI, WHISPER_MODEL, WHISPER_SERVER, WHISPER_SERVER_URL, TRANSCRIPTION_BACKEND,
+    VAD_ENABLED, LONG_FILE_ENABLED, TIERED_ENABLED, TIER_FAST_MODEL, DEDUP_ENABLED,
+    PREREQUISITES_CACHE
+)
+from backends import resolve_model
 
-def check_prerequisites() -> bool:
-    """Check if all required tools and files are available."""
-    # Check whisper-cli
-    if not WHISPER_CLI.exists():
-        print(f"Error: whisper-cli not found at {WHISPER_CLI}")
-        return False
+def file_signature(path: Path) -> Optional[List[int]]:
+    """[mtime_ns, size] of a file, or None if it doesn't exist."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def probe_ffmpeg(ffmpeg: str) -> Optional[str]:
+    """First line of `ffmpeg -version`, or None if ffmpeg can't be run."""
+    from process_runner import PIPE, get_runner
+    try:
+        output = get_runner().run([ffmpeg, "-version"], stdout=PIPE, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode(errors="replace").partition("\n")[0]
+
+def load_probe(cache_path: Path = PREREQUISITES_CACHE) -> Dict:
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_probe(probe: Dict, cache_path: Path = PREREQUISITES_CACHE):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(probe, indent=2), encoding="utf-8")
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Only a cache; probe again next time
+
+def check_prerequisites(backend: str = TRANSCRIPTION_BACKEND, model: Union[str, Path] = WHISPER_MODEL,
+                        fast_model: Optional[Union[str, Path]] = TIER_FAST_MODEL if TIERED_ENABLED else None,
+                        dedupe: bool = DEDUP_ENABLED) -> bool:
+    """
+    Check if all required tools and files are available.
+    A successful probe is cached with the mtime and size of the binaries and models,
+    so later runs only stat them and skip spawning ffmpeg until one of them changes.
+    """
+    if backend == 'server':
+        # The fast model runs on a second whisper-server that we start, which an external URL can't provide
+        if WHISPER_SERVER_URL is not None and fast_model is not None:
+            print("Error: tiered models with the server backend need a local whisper-server; "
+                  "unset WHISPER_SERVER_URL or drop --tiered")
+            return False
+        binary = WHISPER_SERVER if WHISPER_SERVER_URL is None else None
+    else:
+        binary = WHISPER_CLI
+    models = [resolve_model(name) for name in [model, fast_model] if name is not None]
+    ffmpeg = shutil.which("ffmpeg")
+    ffprobe = shutil.which("ffprobe")
+    
+    # Check numpy (only needed for silence trimming, long-file chunking, tiering and dedupe)
+    if VAD_ENABLED or LONG_FILE_ENABLED or fast_model is not None or dedupe:
+        if importlib.util.find_spec("numpy") is None:
+            print("Error: VAD, long-file chunking, tiered models and dedupe require numpy (pip install numpy)")
+            return False
     
-    # Check whisper model
-    if not WHISPER_MODEL.exists():
-        print(f"Error: model not found at {WHISPER_MODEL}")
+    signatures = {str(path): file_signature(Path(path)) for path in [binary, *models, ffmpeg, ffprobe] if path}
+    if load_probe().get('signatures') == signatures:
+        return True
+    
+    # Check the transcriber binary for the selected backend
+    if binary is not None and file_signature(binary) is None:
+        print(f"Error: {binary.name} not found at {binary}")
         return False
     
+    # Check whisper models (the fast model only when tiering)
+    for path in models:
+        if file_signature(path) is None:
+            print(f"Error: model not found at {path}")
+            return False
+    
     # Check ffmpeg
-    try:
-        subprocess.run(["ffmpeg", "-version"], capture_output=True, check=True)
-    except FileNotFoundError:
+    ffmpeg_version = probe_ffmpeg(ffmpeg) if ffmpeg else None
+    if ffmpeg_version is None:
         print("Error: ffmpeg is not installed or not in PATH")
         return False
     
-    return True
\ No newline at end of file
+    # Check ffprobe (input formats and durations)
+    if ffprobe is None:
+        print("Error: ffprobe (part of FFmpeg) is not installed or not in PATH")
+        return False
+    
+    save_probe({'signatures': signatures, 'ffmpeg_version': ffmpeg_version, 'checked': time.time()})
+    return True
@@ -0,0 +1,197 @@
+import asyncio
+import atexit
+import collections
+import concurrent.futures
+import os
+import signal
+import subprocess
+import threading
+from typing import BinaryIO, Callable, List, Optional, Set, Union
+from config import MAX_TRANSCRIBER_PROCESSES, PROCESS_TIMEOUT_SECONDS
+
+# stderr lines kept for error messages and for parsing (e.g. whisper-cli's timings)
+STDERR_TAIL_LINES = 500
+
+PIPE = subprocess.PIPE
+DEVNULL = subprocess.DEVNULL
+
+class Cancelled(Exception):
+    """Raised by ProcessRunner.run() when the job was cancelled (e.g. on Ctrl-C)."""
+
+class ProcessRunner:
+    """
+    Runs ffmpeg and whisper-cli on one asyncio event loop in a background thread.
+    Callers on any thread use run(), which blocks until the process is done, so the
+    worker threads of batch runs stay as they are. Transcriber processes are limited
+    by a semaphore, every run can have a timeout, stderr is handed to a callback line
+    by line (for progress), and cancel_all() kills everything that is running.
+    """
+    
+    def __init__(self, max_transcribers: int = MAX_TRANSCRIBER_PROCESSES,
+                 timeout: Optional[float] = PROCESS_TIMEOUT_SECONDS):
+        self.max_transcribers = max_transcribers
+        self.timeout = timeout
+        self.cancelled = False
+        self.transcriber_pids: Set[int] = set()  # Running transcriber processes (for the governor)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_size = 0
+        self._lock = threading.Lock()
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="process-runner", daemon=True).start()
+            return self._loop
+    
+    async def _run(self, cmd: List[str], input: Optional[bytes], stdin, stdout,
+                   timeout: Optional[float], on_stderr: Optional[Callable[[str], None]],
+                   transcriber: bool, after_spawn: Optional[Callable[[], None]]) -> subprocess.CompletedProcess:
+        if not transcriber:
+            return await self._exec(cmd, input, stdin, stdout, timeout, on_stderr, after_spawn)
+        if self._semaphore is None or self._semaphore_size != self.max_transcribers:
+            # Processes still holding a replaced semaphore release it, not the new one
+            self._semaphore = asyncio.Semaphore(self.max_transcribers)
+            self._semaphore_size = self.max_transcribers
+        async with self._semaphore:
+            return await self._exec(cmd, input, stdin, stdout, timeout, on_stderr, after_spawn, transcriber)
+    
+    async def _exec(self, cmd, input, stdin, stdout, timeout, on_stderr, after_spawn, transcriber=False):
+        try:
+            # Own process group: Ctrl-C goes to us, and a kill also reaches any helpers it started
+            process = await asyncio.create_subprocess_exec(
+                *cmd, stdin=PIPE if input is not None else stdin, stdout=stdout, stderr=PIPE,
+                start_new_session=True
+            )
+        finally:
+            if after_spawn:
+                after_spawn()
+        
+        stderr_tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        if transcriber:
+            self.transcriber_pids.add(process.pid)
+        
+        async def read_stderr():
+            async for raw in process.stderr:
+                line = raw.decode(errors="replace").rstrip()
+                stderr_tail.append(line)
+                if on_stderr:
+                    on_stderr(line)
+        
+        async def write_stdin():
+            if input is None:
+                return
+            try:
+                process.stdin.write(input)
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The process stopped reading; its exit status tells why
+            finally:
+                process.stdin.close()
+        
+        async def read_stdout():
+            return await process.stdout.read() if stdout == PIPE else None
+        
+        async def communicate():
+            output, _, _ = await asyncio.gather(read_stdout(), read_stderr(), write_stdin())
+            await process.wait()
+            return output
+        
+        try:
+            output = await asyncio.wait_for(communicate(), timeout)
+        except BaseException as e:
+            # Timed out or cancelled: don't leave the process running
+            if process.returncode is None:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+            if isinstance(e, asyncio.TimeoutError):
+                raise subprocess.TimeoutExpired(cmd, timeout, stderr="\n".join(stderr_tail)) from None
+            raise
+        finally:
+            self.transcriber_pids.discard(process.pid)
+        return subprocess.CompletedProcess(cmd, process.returncode, output, "\n".join(stderr_tail))
+    
+    def allow_transcribers(self, count: int):
+        """
+        Raise the transcriber limit to at least count, e.g. the number of batch workers,
+        so workers (and the cores split between them) are never left waiting for a slot.
+        """
+        with self._lock:
+            self.max_transcribers = max(self.max_transcribers, count)
+    
+    def submit(self, cmd: List[str], *, input: Optional[bytes] = None,
+               stdin: Union[None, int, BinaryIO] = None, stdout: Union[int, BinaryIO] = DEVNULL,
+               timeout: Optional[float] = None, on_stderr: Optional[Callable[[str], None]] = None,
+               transcriber: bool = False,
+               after_spawn: Optional[Callable[[], None]] = None) -> concurrent.futures.Future:
+        """
+        Start a process without waiting for it; see run() for the arguments.
+        after_spawn is called on the event loop once the process was started (or failed
+        to start), e.g. to close the parent's end of a pipe.
+        """
+        if self.cancelled:
+            raise Cancelled(cmd[0])
+        coro = self._run(cmd, input, stdin, stdout, timeout if timeout is not None else self.timeout,
+                         on_stderr, transcriber, after_spawn)
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+    
+    def wait(self, future: concurrent.futures.Future, check: bool = False) -> subprocess.CompletedProcess:
+        """Wait for a submitted process. Ctrl-C while waiting kills it."""
+        try:
+            result = future.result()
+        except concurrent.futures.CancelledError:
+            raise Cancelled("process cancelled") from None
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+        if check and result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        return result
+    
+    def run(self, cmd: List[str], *, input: Optional[bytes] = None,
+            stdin: Union[None, int, BinaryIO] = None, stdout: Union[int, BinaryIO] = DEVNULL,
+            timeout: Optional[float] = None, on_stderr: Optional[Callable[[str], None]] = None,
+            transcriber: bool = False, check: bool = False) -> subprocess.CompletedProcess:
+        """
+        Run a process to completion like subprocess.run(). stderr is always captured
+        (the last lines end up in result.stderr as text); stdout only with stdout=PIPE.
+        transcriber=True counts the process against the transcriber limit.
+        Raises subprocess.TimeoutExpired after timeout seconds (default: the runner's),
+        and Cancelled if the runner was cancelled.
+        """
+        future = self.submit(cmd, input=input, stdin=stdin, stdout=stdout, timeout=timeout,
+                             on_stderr=on_stderr, transcriber=transcriber)
+        return self.wait(future, check=check)
+    
+    def cancel_all(self, wait_seconds: float = 5.0):
+        """Kill every running process; later runs raise Cancelled."""
+        self.cancelled = True
+        if self._loop is None:
+            return
+        
+        async def cancel_tasks():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_tasks(), self._loop).result(wait_seconds)
+        except concurrent.futures.TimeoutError:
+            pass
+
+_runner: Optional[ProcessRunner] = None
+_runner_lock = threading.Lock()
+
+def get_runner() -> ProcessRunner:
+    """Get the shared process runner (its event loop starts on first use)."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = ProcessRunner()
+            atexit.register(_runner.cancel_all)
+        return _runner
@@ -0,0 +1,102 @@
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+from config import PROGRESS_ENABLED
+
+# ffmpeg -progress pipe:2 reports the decoded position (out_time_ms is in microseconds too)
+FFMPEG_PROGRESS_PATTERN = re.compile(r"^out_time_(?:us|ms)=(\d+)$")
+
+# whisper-cli -pp prints "whisper_print_progress_callback: progress =  45%"
+WHISPER_PROGRESS_PATTERN = re.compile(r"progress\s*=\s*(\d+)%")
+
+BAR_WIDTH = 20
+REFRESH_SECONDS = 0.2
+
+class ProgressBoard:
+    """
+    One status line with the progress of every running ffmpeg/whisper-cli job,
+    redrawn in place. Only drawn when stdout is a terminal.
+    """
+    
+    def __init__(self, enabled: bool = PROGRESS_ENABLED):
+        self.enabled = enabled and sys.stdout.isatty()
+        self.jobs: Dict[int, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._next_key = 0
+        self._drawn = 0.0
+    
+    def start(self, label: str) -> int:
+        with self._lock:
+            self._next_key += 1
+            self.jobs[self._next_key] = (label, "")
+            return self._next_key
+    
+    def update(self, key: int, status: str):
+        with self._lock:
+            if key in self.jobs:
+                self.jobs[key] = (self.jobs[key][0], status)
+            self._draw()
+    
+    def finish(self, key: int):
+        with self._lock:
+            self.jobs.pop(key, None)
+            self._draw(force=True)
+    
+    def _draw(self, force: bool = False):
+        if not self.enabled or (not force and time.monotonic() - self._drawn < REFRESH_SECONDS):
+            return
+        self._drawn = time.monotonic()
+        line = " | ".join(f"{label} {status}" for label, status in self.jobs.values() if status)
+        sys.stdout.write("\r\033[K" + (f"⏳ {line}" if line else ""))
+        sys.stdout.flush()
+
+def bar(fraction: float) -> str:
+    filled = int(fraction * BAR_WIDTH)
+    return f"▕{'█' * filled}{'░' * (BAR_WIDTH - filled)}▏ {fraction:.0%}"
+
+def parse_ffmpeg_line(line: str, duration: Optional[float] = None) -> Optional[str]:
+    """Status from an ffmpeg -progress pipe:2 line, or None for other lines."""
+    match = FFMPEG_PROGRESS_PATTERN.match(line)
+    if not match:
+        return None
+    seconds = int(match.group(1)) / 1_000_000
+    return bar(min(1.0, seconds / duration)) if duration else f"decoded {seconds:.0f}s"
+
+def parse_whisper_line(line: str) -> Optional[str]:
+    """Status from a whisper-cli -pp progress line, or None for other lines."""
+    match = WHISPER_PROGRESS_PATTERN.search(line)
+    return bar(int(match.group(1)) / 100) if match else None
+
+_board: Optional[ProgressBoard] = None
+
+def get_progress() -> ProgressBoard:
+    """Get the shared progress board."""
+    global _board
+    if _board is None:
+        _board = ProgressBoard()
+    return _board
+
+@contextmanager
+def progress_line(label: str, parse: Callable[[str], Optional[str]]):
+    """Show a job on the progress board; yields the stderr line callback for the process."""
+    board = get_progress()
+    key = board.start(label)
+    
+    def on_line(line: str):
+        status = parse(line)
+        if status:
+            board.update(key, status)
+    
+    try:
+        yield on_line
+    finally:
+        board.finish(key)
+
+def ffmpeg_progress(label: str, duration: Optional[float] = None):
+    return progress_line(label, lambda line: parse_ffmpeg_line(line, duration))
+
+def whisper_progress(label: str):
+    return progress_line(label, parse_whisper_line)
@@ -0,0 +1,113 @@
+import heapq
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+def estimate_missing(durations: Dict[Path, Optional[float]]) -> Dict[Path, float]:
+    """Fill in files ffprobe couldn't read from their size, at the median seconds per byte."""
+    rates = [seconds / path.stat().st_size for path, seconds in durations.items()
+             if seconds and path.exists() and path.stat().st_size]
+    rate = statistics.median(rates) if rates else 0.0
+    estimated = {}
+    for path, seconds in durations.items():
+        if seconds is None:
+            try:
+                seconds = path.stat().st_size * rate
+            except OSError:
+                seconds = 0.0
+        estimated[path] = seconds
+    return estimated
+
+def longest_first(durations: Sequence[float]) -> List[int]:
+    """
+    Indices in longest-processing-time-first order. Workers that take the next job
+    as soon as they are free then get LPT list scheduling: long files start early
+    and short ones fill the gaps at the end, instead of one long file running alone.
+    """
+    return sorted(range(len(durations)), key=lambda i: -durations[i])
+
+def makespan(durations: Sequence[float], workers: int, busy: Sequence[float] = ()) -> float:
+    """
+    Time until `workers` workers finish the jobs in the given order, each taking the
+    next job when free. busy holds the remaining time of jobs already running.
+    """
+    free_at = sorted(busy)[:workers]
+    free_at += [0.0] * (workers - len(free_at))
+    heapq.heapify(free_at)
+    for duration in durations:
+        heapq.heappush(free_at, heapq.heappop(free_at) + duration)
+    return max(free_at, default=0.0)
+
+def format_eta(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class Progress:
+    """
+    Progress of a batch run in audio time. The realtime factor (wall seconds per
+    audio second, per worker) is measured on finished files; the ETA replays the
+    remaining queue and the running files on the workers with it.
+    """
+    
+    def __init__(self, durations: Dict[str, float], order: List[str], workers: int):
+        self.durations = durations
+        self.queued = list(order)
+        self.workers = workers
+        self.running: Dict[str, float] = {}  # file -> start time
+        self.audio_done = 0.0
+        self.wall_done = 0.0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def start(self, mp3_file: str):
+        with self._lock:
+            if mp3_file in self.queued:
+                self.queued.remove(mp3_file)
+            self.running[mp3_file] = time.perf_counter()
+    
+    def finish(self, mp3_file: str, success: bool):
+        with self._lock:
+            started = self.running.pop(mp3_file, None)
+            seconds = self.durations.get(mp3_file, 0.0)
+            if success and started is not None and seconds:
+                self.audio_done += seconds
+                self.wall_done += time.perf_counter() - started
+    
+    def realtime_factor(self) -> Optional[float]:
+        with self._lock:
+            return self.wall_done / self.audio_done if self.audio_done else None
+    
+    def audio_hours_per_hour(self) -> Optional[float]:
+        """Audio transcribed per wall-clock time since the run started."""
+        elapsed = time.perf_counter() - self.started
+        return self.audio_done / elapsed if elapsed > 0 and self.audio_done else None
+    
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the run finishes, once a file has finished."""
+        rtf = self.realtime_factor()
+        if rtf is None:
+            return None
+        now = time.perf_counter()
+        with self._lock:
+            busy = [max(0.0, self.durations.get(f, 0.0) * rtf - (now - started))
+                    for f, started in self.running.items()]
+            queued = [self.durations.get(f, 0.0) * rtf for f in self.queued]
+        return makespan(queued, self.workers, busy)
+    
+    def status_line(self) -> str:
+        """E.g. '⏳ 12.0/95.5 min of audio, 3.1 audio-h/h, ETA 24m 10s'."""
+        total = sum(self.durations.values())
+        line = f"⏳ {self.audio_done / 60:.1f}/{total / 60:.1f} min of audio"
+        rate = self.audio_hours_per_hour()
+        if rate is not None:
+            line += f", {rate:.1f} audio-h/h"
+        eta = self.eta()
+        if eta is not None:
+            line += f", ETA {format_eta(eta)}"
+        return line
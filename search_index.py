@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import SEARCH_INDEX_DB
+from subtitle_writer import Segment, read_subtitle, subtitle_path
+
+# Subtitle formats to index from, best first: JSON and SRT/VTT keep end times, LRC doesn't
+INDEX_FORMATS = ['json', 'srt', 'vtt', 'lrc']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    subtitle TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_file ON segments (file_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5 (
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts (segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# A match is (audio path, start_ms, end_ms, segment text)
+Match = Tuple[Path, int, int, str]
+
+def preferred_subtitle(audio_path: Path, formats: Iterable[str]) -> Optional[Path]:
+    """The subtitle of an audio file to index, given the formats that exist."""
+    present = set(formats)
+    for subtitle_format in INDEX_FORMATS:
+        if subtitle_format in present:
+            return subtitle_path(audio_path, subtitle_format)
+    return None
+
+def indexed_path(audio_path: Path) -> Path:
+    """Path a file is indexed under: its folder resolved, the name kept (subtitles sit next to a symlink)."""
+    return audio_path.parent.resolve() / audio_path.name
+
+def fts_query(query: str, phrase: bool = False) -> str:
+    """Quote user input for FTS5 MATCH: every word must occur, or the whole phrase."""
+    words = query.split()
+    if phrase:
+        return '"' + " ".join(words).replace('"', '""') + '"'
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+class SearchIndex:
+    """
+    Full-text index of the transcript segments of the library in a SQLite FTS5 table.
+    Each audio file is indexed from one of its subtitle files, together with that
+    file's mtime and size, so a reindex only re-reads subtitles that changed.
+    """
+    
+    def __init__(self, db_path: Path = SEARCH_INDEX_DB):
+        self.db_path = db_path
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation, like the job queue
+        db = sqlite3.connect(str(self.db_path), timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+    
+    @staticmethod
+    def _replace(db: sqlite3.Connection, audio_path: Path, subtitle: Path, segments: List[Segment]):
+        st = subtitle.stat()
+        db.execute("DELETE FROM segments WHERE file_id = (SELECT id FROM files WHERE path = ?)", (str(audio_path),))
+        db.execute(
+            "INSERT INTO files (path, subtitle, mtime_ns, size) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET subtitle = excluded.subtitle, "
+            "mtime_ns = excluded.mtime_ns, size = excluded.size",
+            (str(audio_path), str(subtitle), st.st_mtime_ns, st.st_size)
+        )
+        file_id = db.execute("SELECT id FROM files WHERE path = ?", (str(audio_path),)).fetchone()[0]
+        db.executemany(
+            "INSERT INTO segments (file_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?)",
+            [(file_id, int(s['start']), int(s['end']), s['text'].strip())
+             for s in segments if s['text'].strip()]
+        )
+    
+    @staticmethod
+    def _remove(db: sqlite3.Connection, audio_path: str):
+        db.execute("DELETE FROM segments WHERE file_id = (SELECT id FROM files WHERE path = ?)", (audio_path,))
+        db.execute("DELETE FROM files WHERE path = ?", (audio_path,))
+    
+    def add(self, audio_path: Path, segments: List[Segment], formats: List[str]):
+        """
+        Index an audio file after its segments were written in the given formats.
+        The subtitle is chosen from every format on disk, as update() does; if that is
+        one written before, its segments are read from it.
+        """
+        from library_index import get_index
+        
+        audio_path = indexed_path(audio_path)
+        subtitle = preferred_subtitle(audio_path, get_index().subtitle_formats(audio_path))
+        if subtitle is None:
+            return
+        subtitle_format = subtitle.suffix[1:]
+        if subtitle_format not in formats:
+            try:
+                segments = read_subtitle(subtitle, subtitle_format)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠️  Could not read {subtitle}: {e}")
+                return
+        with self._transaction() as db:
+            self._replace(db, audio_path, subtitle, segments)
+    
+    def indexed(self) -> Dict[str, Tuple[str, int, int]]:
+        """audio path -> (subtitle, mtime_ns, size) for every indexed file."""
+        with self._connect() as db:
+            rows = db.execute("SELECT path, subtitle, mtime_ns, size FROM files").fetchall()
+        return {path: (subtitle, mtime_ns, size) for path, subtitle, mtime_ns, size in rows}
+    
+    def update(self, root: Path, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Bring the index for the audio files below root up to date with their subtitles.
+        Returns counts of 'indexed', 'unchanged' and 'removed' files.
+        """
+        from library_index import get_index
+        
+        root = root.resolve()
+        library = get_index()
+        indexed = self.indexed()
+        counts = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        seen = set()
+        pending = []
+        
+        def flush():
+            with self._transaction() as db:
+                for audio_path, subtitle, segments in pending:
+                    self._replace(db, audio_path, subtitle, segments)
+            pending.clear()
+        
+        for audio_path in library.walk_audio_files(root):
+            audio_path = indexed_path(audio_path)
+            key = str(audio_path)
+            seen.add(key)
+            subtitle = preferred_subtitle(audio_path, library.subtitle_formats(audio_path))
+            if subtitle is None:
+                continue
+            try:
+                st = subtitle.stat()
+            except OSError:
+                continue
+            if indexed.get(key) == (str(subtitle), st.st_mtime_ns, st.st_size):
+                counts['unchanged'] += 1
+                continue
+            try:
+                segments = read_subtitle(subtitle, subtitle.suffix[1:])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠️  Could not read {subtitle}: {e}")
+                continue
+            pending.append((audio_path, subtitle, segments))
+            counts['indexed'] += 1
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+        library.save()
+        
+        # Files below root that are gone, or whose subtitles are gone
+        prefix = str(root).rstrip("/") + "/"
+        stale = [path for path in indexed if path.startswith(prefix) and
+                 (path not in seen or preferred_subtitle(Path(path), library.subtitle_formats(Path(path))) is None)]
+        if stale:
+            with self._transaction() as db:
+                for path in stale:
+                    self._remove(db, path)
+            counts['removed'] = len(stale)
+        return counts
+    
+    def search(self, query: str, limit: int = 20, phrase: bool = False) -> List[Match]:
+        """Best matching segments first (BM25), with their audio file and times in ms."""
+        match = fts_query(query, phrase)
+        if not match:
+            return []
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT files.path, segments.start_ms, segments.end_ms, segments.text "
+                "FROM segments_fts JOIN segments ON segments.id = segments_fts.rowid "
+                "JOIN files ON files.id = segments.file_id "
+                "WHERE segments_fts MATCH ? ORDER BY segments_fts.rank LIMIT ?",
+                (match, limit)
+            ).fetchall()
+        return [(Path(path), start, end, text) for path, start, end, text in rows]
+    
+    def stats(self) -> Tuple[int, int]:
+        """(indexed files, indexed segments)."""
+        with self._connect() as db:
+            files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            segments = db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return files, segments
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index() -> SearchIndex:
+    """Get the shared search index (the database is created on first use)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
@@ -1,43 +1,49 @@
 from pathlib import Path
-from typing import Dict, List
-import questionary
+from typing import Dict, List, Union
+from library_index import get_index
+from subtitle_writer import SUBTITLE_FORMATS, normalize_formats
 
 def check_existing_subtitles(mp3_path: Path) -> Dict[str, bool]:
     """
     Check if subtitle files already exist for the given MP3 file.
     Returns dict with format as key and existence as boolean value.
     """
-    base_name = mp3_path.stem
-    parent_dir = mp3_path.parent
+    present = get_index().subtitle_formats(mp3_path)
     
     existing = {
-        'srt': (parent_dir / f"{base_name}.srt").exists(),
-        'lrc': (parent_dir / f"{base_name}.lrc").exists()
+        fmt: fmt in present
+        for fmt in SUBTITLE_FORMATS
     }
     
     return existing
 
 def get_existing_subtitle_files(mp3_path: Path) -> List[str]:
     """Get list of existing subtitle formats for the MP3 file."""
-    existing = check_existing_subtitles(mp3_path)
-    return [fmt for fmt, exists in existing.items() if exists]
+    present = get_index().subtitle_formats(mp3_path)
+    return [fmt for fmt in SUBTITLE_FORMATS if fmt in present]
 
-def handle_existing_subtitles(mp3_path: Path, requested_format: str) -> str:
+def handle_existing_subtitles(mp3_path: Path, requested_formats: Union[str, List[str]]) -> str:
     """
     Handle the case where subtitle files already exist.
     Returns the action to take: 'overwrite', 'skip', or 'cancel'
     """
-    existing = check_existing_subtitles(mp3_path)
+    import questionary
+    
+    requested_formats = normalize_formats(requested_formats)
     existing_formats = get_existing_subtitle_files(mp3_path)
     
     if not existing_formats:
         # No existing subtitles, proceed normally
         return 'proceed'
     
-    if existing[requested_format]:
-        # The requested format already exists
-        print(f"\n⚠️  A {requested_format.upper()} file already exists for this MP3:")
-        print(f"   {mp3_path.parent / f'{mp3_path.stem}.{requested_format}'}")
+    conflicting = [fmt for fmt in requested_formats if fmt in existing_formats]
+    
+    if conflicting:
+        # A requested format already exists
+        conflicting_list = "/".join([f.upper() for f in conflicting])
+        print(f"\n⚠️  A {conflicting_list} file already exists for this file:")
+        for fmt in conflicting:
+            print(f"   {mp3_path.parent / f'{mp3_path.stem}.{fmt}'}")
         
         action = questionary.select(
             "What would you like to do?",
@@ -59,8 +65,8 @@ def handle_existing_subtitles(mp3_path: Path, requested_format: str) -> str:
     else:
         # Different format exists, but not the requested one
         existing_list = ", ".join([f.upper() for f in existing_formats])
-        print(f"\n📄 This MP3 already has subtitle files: {existing_list}")
-        print(f"   You're requesting: {requested_format.upper()}")
+        print(f"\n📄 This file already has subtitle files: {existing_list}")
+        print(f"   You're requesting: {', '.join([f.upper() for f in requested_formats])}")
         
         action = questionary.select(
             "Do you want to generate the additional subtitle format?",
@@ -0,0 +1,146 @@
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Union
+
+# A segment is a dict: {'start': ms, 'end': ms, 'text': str}
+Segment = Dict
+
+def format_srt_timestamp(ms: int) -> str:
+    """Format milliseconds as an SRT timestamp (HH:MM:SS,mmm)."""
+    hours, ms = divmod(int(ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+def format_vtt_timestamp(ms: int) -> str:
+    """Format milliseconds as a WebVTT timestamp (HH:MM:SS.mmm)."""
+    return format_srt_timestamp(ms).replace(",", ".")
+
+def format_lrc_timestamp(ms: int) -> str:
+    """Format milliseconds as an LRC timestamp ([mm:ss.xx])."""
+    minutes, ms = divmod(int(ms), 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"[{minutes:02d}:{seconds:02d}.{ms // 10:02d}]"
+
+def render_srt(segments: List[Segment]) -> str:
+    """Render segments as SRT."""
+    blocks = []
+    for i, segment in enumerate(segments, 1):
+        blocks.append(
+            f"{i}\n"
+            f"{format_srt_timestamp(segment['start'])} --> {format_srt_timestamp(segment['end'])}\n"
+            f"{segment['text']}\n"
+        )
+    return "\n".join(blocks)
+
+def render_lrc(segments: List[Segment]) -> str:
+    """Render segments as LRC (same layout as whisper-cli's --output-lrc)."""
+    lines = ["[by:whisper.cpp]"]
+    for segment in segments:
+        lines.append(f"{format_lrc_timestamp(segment['start'])}{segment['text']}")
+    return "\n".join(lines) + "\n"
+
+def render_vtt(segments: List[Segment]) -> str:
+    """Render segments as WebVTT."""
+    blocks = ["WEBVTT\n"]
+    for segment in segments:
+        blocks.append(
+            f"{format_vtt_timestamp(segment['start'])} --> {format_vtt_timestamp(segment['end'])}\n"
+            f"{segment['text']}\n"
+        )
+    return "\n".join(blocks)
+
+def render_json(segments: List[Segment]) -> str:
+    """Render segments as JSON (times in milliseconds)."""
+    return json.dumps({'segments': segments}, ensure_ascii=False, indent=2) + "\n"
+
+RENDERERS = {
+    'srt': render_srt,
+    'lrc': render_lrc,
+    'vtt': render_vtt,
+    'json': render_json,
+}
+
+# Formats in the order they are offered to the user
+SUBTITLE_FORMATS = list(RENDERERS)
+
+CUE_TIMES = re.compile(r"(\d+):(\d\d):(\d\d)[,.](\d{3})\s*-->\s*(\d+):(\d\d):(\d\d)[,.](\d{3})")
+LRC_LINE = re.compile(r"^\[(\d+):(\d\d)\.(\d{2,3})\](.*)$")
+
+def _cue_ms(hours: str, minutes: str, seconds: str, ms: str) -> int:
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(ms)
+
+def parse_cues(text: str) -> List[Segment]:
+    """Parse SRT or WebVTT cues (a timing line followed by text lines)."""
+    segments = []
+    for block in re.split(r"\n\s*\n", text.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            match = CUE_TIMES.search(line)
+            if match:
+                times = match.groups()
+                segments.append({
+                    'start': _cue_ms(*times[:4]),
+                    'end': _cue_ms(*times[4:]),
+                    'text': " ".join(lines[i + 1:]).strip(),
+                })
+                break
+    return segments
+
+def parse_lrc(text: str) -> List[Segment]:
+    """Parse LRC lines; a line ends where the next one starts."""
+    segments = []
+    for line in text.splitlines():
+        match = LRC_LINE.match(line.strip())
+        if match:
+            minutes, seconds, fraction, lyric = match.groups()
+            start = (int(minutes) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, "0"))
+            if segments:
+                segments[-1]['end'] = start
+            segments.append({'start': start, 'end': start, 'text': lyric.strip()})
+    return segments
+
+def parse_json(text: str) -> List[Segment]:
+    return [{'start': int(s['start']), 'end': int(s['end']), 'text': s['text']}
+            for s in json.loads(text)['segments']]
+
+PARSERS = {
+    'srt': parse_cues,
+    'lrc': parse_lrc,
+    'vtt': parse_cues,
+    'json': parse_json,
+}
+
+def read_subtitle(path: Path, subtitle_format: str) -> List[Segment]:
+    """Read segments back from a subtitle file written by write_subtitle (or whisper-cli)."""
+    return PARSERS[subtitle_format](path.read_text(encoding="utf-8", errors="replace"))
+
+def normalize_formats(subtitle_formats: Union[str, List[str]]) -> List[str]:
+    """Accept a single format or a list of formats, returning a de-duplicated list."""
+    if isinstance(subtitle_formats, str):
+        subtitle_formats = [subtitle_formats]
+    return list(dict.fromkeys(subtitle_formats))
+
+def subtitle_path(mp3_path: Path, subtitle_format: str) -> Path:
+    """Path of the subtitle file written next to the MP3."""
+    return mp3_path.parent / f"{mp3_path.stem}.{subtitle_format}"
+
+def write_subtitle(segments: List[Segment], output_path: Path, subtitle_format: str):
+    """
+    Render segments in the given format and write them to output_path.
+    The file is written to a temporary name and renamed, so a crash never leaves
+    a truncated subtitle behind.
+    """
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(RENDERERS[subtitle_format](segments))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
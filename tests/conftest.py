@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+STUB_DIR = REPO_DIR / "benchmarks"
+sys.path.insert(0, str(REPO_DIR))
+
+@pytest.fixture
+def stub_env(monkeypatch):
+    """Make the stub whisper-cli/server answer right away."""
+    monkeypatch.setenv("STUB_WHISPER_RTF", "0")
+    monkeypatch.setenv("STUB_WHISPER_LOAD_SECONDS", "0")
@@ -0,0 +1,115 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from conftest import REPO_DIR
+from job_queue import JobQueue
+
+# A worker process whose transcription only logs the file (and fails files named fail*)
+WORKER_SCRIPT = """
+import sys, time
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+import audio_processor, job_queue
+
+def generate_subtitles(path, formats, action=None, threads=None):
+    with open(sys.argv[3], "a") as f:
+        f.write(f"{job_queue.worker_id()} {path}\\n")
+    time.sleep(0.1)
+    return not path.name.startswith("fail")
+
+audio_processor.generate_subtitles = generate_subtitles
+queue = job_queue.JobQueue(Path(sys.argv[2]), lease_seconds=float(sys.argv[4]), max_attempts=2)
+job_queue.QueueWorker(queue, workers=2, poll_seconds=0.1).run()
+"""
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "queue.sqlite"
+
+def start_worker(db_path: Path, log_path: Path, lease_seconds: float = 30) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, str(REPO_DIR), str(db_path),
+                             str(log_path), str(lease_seconds)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+def wait_for(workers):
+    for worker in workers:
+        _, stderr = worker.communicate(timeout=60)
+        assert worker.returncode == 0, stderr
+
+def processed(log_path: Path):
+    """(worker, path) per processed job."""
+    return [tuple(line.split(" ", 1)) for line in log_path.read_text().splitlines()]
+
+def test_two_worker_processes_share_the_queue(db_path, tmp_path):
+    queue = JobQueue(db_path)
+    paths = [tmp_path / f"track_{i:02d}.mp3" for i in range(30)] + [tmp_path / "fail.mp3"]
+    assert queue.enqueue([(path, ['srt'], 'proceed') for path in paths]) == len(paths)
+    
+    log_path = tmp_path / "processed.log"
+    wait_for([start_worker(db_path, log_path), start_worker(db_path, log_path)])
+    
+    runs = processed(log_path)
+    assert sorted(path for _, path in runs) == sorted(str(path) for path in paths)  # Each job exactly once
+    assert len({worker for worker, _ in runs}) == 2
+    assert queue.counts() == {'done': 30, 'failed': 1}
+    assert queue.failures() == [(str(tmp_path / "fail.mp3"), "transcription failed")]
+
+def test_expired_lease_is_taken_over(db_path, tmp_path):
+    queue = JobQueue(db_path, lease_seconds=0.5)
+    queue.enqueue([(tmp_path / "a.mp3", ['srt'], 'proceed')])
+    job_id, _, _, _ = queue.lease("crashed-worker")
+    assert queue.lease("other-worker") is None  # Still leased
+    
+    log_path = tmp_path / "processed.log"
+    wait_for([start_worker(db_path, log_path, lease_seconds=0.5)])
+    
+    assert [path for _, path in processed(log_path)] == [str(tmp_path / "a.mp3")]
+    assert queue.counts() == {'done': 1}
+    assert not queue.finish(job_id, "crashed-worker", True)  # Its lease was lost
+
+def test_renewed_lease_is_not_taken_over(db_path, tmp_path):
+    queue = JobQueue(db_path, lease_seconds=0.3)
+    queue.enqueue([(tmp_path / "a.mp3", ['srt'], 'proceed')])
+    job_id, _, _, _ = queue.lease("worker-a")
+    for _ in range(3):
+        time.sleep(0.15)
+        assert queue.renew([job_id], "worker-a") == 1
+    assert queue.lease("worker-b") is None
+    assert queue.finish(job_id, "worker-a", True)
+
+def test_job_fails_after_max_attempts(db_path, tmp_path):
+    queue = JobQueue(db_path, lease_seconds=0.1, max_attempts=2)
+    queue.enqueue([(tmp_path / "a.mp3", ['srt'], 'proceed')])
+    assert queue.lease("worker-a") is not None
+    time.sleep(0.2)
+    assert queue.lease("worker-b") is not None  # Second attempt
+    time.sleep(0.2)
+    assert queue.lease("worker-c") is None
+    assert queue.counts() == {'failed': 1}
+    assert queue.failures() == [(str(tmp_path / "a.mp3"), "lease expired")]
+
+def test_released_job_does_not_use_up_an_attempt(db_path, tmp_path):
+    queue = JobQueue(db_path, max_attempts=1)
+    queue.enqueue([(tmp_path / "a.mp3", ['srt'], 'proceed')])
+    job_id, _, _, _ = queue.lease("worker-a")
+    queue.release(job_id, "worker-a")
+    assert queue.lease("worker-b") is not None
+
+def test_enqueue_skips_queued_and_running_jobs(db_path, tmp_path):
+    queue = JobQueue(db_path)
+    job = (tmp_path / "a.mp3", ['srt'], 'proceed')
+    assert queue.enqueue([job]) == 1
+    assert queue.enqueue([job]) == 0  # Already queued
+    job_id, _, _, _ = queue.lease("worker-a")
+    assert queue.enqueue([job]) == 0  # Running
+    assert queue.finish(job_id, "worker-a", False, "transcription failed")
+    
+    # Finished or failed jobs are queued again, with fresh attempts and new formats
+    assert queue.enqueue([(tmp_path / "a.mp3", ['srt', 'lrc'], 'overwrite')]) == 1
+    assert queue.counts() == {'queued': 1}
+    _, path, formats, action = queue.lease("worker-b")
+    assert (path, formats, action) == (tmp_path / "a.mp3", ['srt', 'lrc'], 'overwrite')
@@ -0,0 +1,77 @@
+import pytest
+
+import backends
+import prerequisites
+from backends import silent_wav
+from conftest import STUB_DIR
+
+@pytest.fixture
+def server(stub_env, tmp_path):
+    backend = backends.WhisperServerBackend(model=tmp_path / "model.bin",
+                                            server=STUB_DIR / "stub_whisper_server.py",
+                                            url=None, port=backends.free_port("127.0.0.1"),
+                                            startup_timeout=10)
+    yield backend
+    backend.close()
+
+def test_starts_on_first_use_and_transcribes(server):
+    assert not server.is_ready()
+    segments = server.transcribe(silent_wav(12))
+    assert server.process is not None and server.is_ready()
+    assert [s['text'] for s in segments] == ["segment 0", "segment 1", "segment 2"]
+    assert segments[0]['start'] == 0 and segments[-1]['end'] == pytest.approx(12000, abs=100)
+
+def test_accepts_paths_and_streams(server, tmp_path):
+    wav_path = tmp_path / "audio.wav"
+    wav_path.write_bytes(silent_wav(6))
+    assert len(server.transcribe(wav_path)) == 2
+    with open(wav_path, "rb") as f:
+        assert len(server.transcribe(f)) == 2
+
+def test_start_is_shared_by_later_requests(server):
+    server.transcribe(silent_wav(1))
+    process = server.process
+    server.transcribe(silent_wav(1))
+    assert server.process is process
+
+def test_close_stops_the_server(server):
+    server.transcribe(silent_wav(1))
+    process = server.process
+    server.close()
+    assert server.process is None
+    assert process.poll() is not None
+    assert not server.is_ready()
+
+def test_failed_start_returns_none(stub_env, tmp_path):
+    broken = tmp_path / "whisper-server"
+    broken.write_text("#!/bin/sh\nexit 1\n")
+    broken.chmod(0o755)
+    backend = backends.WhisperServerBackend(model=tmp_path / "model.bin", server=broken, url=None,
+                                            port=backends.free_port("127.0.0.1"), startup_timeout=10)
+    assert backend.transcribe(silent_wav(1)) is None
+
+def test_external_url_is_used_without_starting_a_server(server, tmp_path):
+    server.start()
+    external = backends.WhisperServerBackend(model=tmp_path / "model.bin", server=tmp_path / "missing",
+                                             url=server.url)
+    assert len(external.transcribe(silent_wav(6))) == 2
+    assert external.process is None
+
+def test_external_url_has_no_second_model(tmp_path):
+    external = backends.WhisperServerBackend(model=tmp_path / "model.bin", url="http://127.0.0.1:9")
+    with pytest.raises(ValueError):
+        external.with_model(tmp_path / "fast.bin")
+
+def test_second_model_runs_on_its_own_server(server, tmp_path):
+    fast = server.with_model(tmp_path / "fast.bin")
+    try:
+        assert fast.port != server.port
+        assert len(fast.transcribe(silent_wav(6))) == 2
+        assert fast.process is not None and server.process is None
+    finally:
+        fast.close()
+
+def test_prerequisites_reject_tiering_with_external_url(monkeypatch, capsys):
+    monkeypatch.setattr(prerequisites, "WHISPER_SERVER_URL", "http://127.0.0.1:9")
+    assert not prerequisites.check_prerequisites('server', "medium", "base")
+    assert "WHISPER_SERVER_URL" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import audio_processor
+import backends
+import tiering
+from conftest import STUB_DIR
+
+SAMPLE_RATE = 16000
+
+@pytest.fixture
+def tiered(stub_env, monkeypatch, tmp_path):
+    """Tiered transcription with the stub whisper-cli; texts say which model wrote them."""
+    monkeypatch.setenv("STUB_WHISPER_TEXT", " {model} {i}")
+    backends.configure_backend("cli", tmp_path / "full.bin", cli=STUB_DIR / "stub_whisper_cli.py")
+    audio_processor.configure_tiering(str(tmp_path / "fast.bin"))
+    yield
+    audio_processor.configure_tiering(None)
+    backends.configure_backend()
+
+def transcribe(seconds: int):
+    # The stub reports one segment per 5 seconds of audio
+    return audio_processor.transcribe_samples(np.zeros(seconds * SAMPLE_RATE, dtype=np.int16))
+
+def assert_ordered(segments):
+    for previous, segment in zip(segments, segments[1:]):
+        assert previous['end'] <= segment['start'] < segment['end']
+
+def test_confident_fast_model_is_kept(tiered, monkeypatch):
+    monkeypatch.setenv("STUB_WHISPER_CONFIDENCE", "0.9")
+    segments = transcribe(30)
+    assert [s['text'] for s in segments] == [f"fast {i}" for i in range(6)]
+
+def test_low_confidence_segment_is_replaced(tiered, monkeypatch):
+    monkeypatch.setenv("STUB_WHISPER_LOW_SEGMENTS", "2")
+    segments = transcribe(30)
+    # Segment 2 (10-15 s) is re-run as the padded span 9.5-15.5 s
+    assert [s['text'] for s in segments] == ["fast 0", "fast 1", "full 0", "full 1", "fast 3", "fast 4", "fast 5"]
+    assert_ordered(segments)
+    assert segments[2]['start'] == 10000 and segments[3]['end'] == 15500
+    assert segments[-1]['end'] == 30000
+
+def test_nearby_low_segments_are_re_run_as_one_span(tiered, monkeypatch):
+    monkeypatch.setenv("STUB_WHISPER_LOW_SEGMENTS", "1,2")
+    segments = transcribe(30)
+    texts = [s['text'] for s in segments]
+    assert "fast 1" not in texts and "fast 2" not in texts
+    assert texts[0] == "fast 0" and texts[-3:] == ["fast 3", "fast 4", "fast 5"]
+    assert all(text.startswith("full") for text in texts[1:-3])
+    assert_ordered(segments)
+
+def test_mostly_uncertain_file_is_redone_with_the_full_model(tiered, monkeypatch):
+    monkeypatch.setenv("STUB_WHISPER_LOW_SEGMENTS", "0,1,2,3")
+    segments = transcribe(30)
+    assert [s['text'] for s in segments] == [f"full {i}" for i in range(6)]
+    assert segments[-1]['end'] == 30000
+
+def test_half_uncertain_file_is_refined_in_spans(tiered, monkeypatch):
+    # TIER_FILE_FRACTION is 0.5: three of six segments are not more than half
+    monkeypatch.setenv("STUB_WHISPER_LOW_SEGMENTS", "0,3,5")
+    texts = [s['text'] for s in transcribe(30)]
+    assert {"fast 1", "fast 2", "fast 4"} <= set(texts)
+    assert not {"fast 0", "fast 3", "fast 5"} & set(texts)
+
+def test_spans_are_padded_merged_and_clipped():
+    segments = [
+        {'start': 0, 'end': 1000, 'confidence': 0.2},
+        {'start': 1000, 'end': 2000, 'confidence': 0.9},
+        {'start': 2000, 'end': 3000, 'confidence': 0.2},
+        {'start': 9000, 'end': 10000, 'confidence': 0.2},
+        {'start': 12000, 'end': 13000},  # No confidence reported: trusted
+    ]
+    assert tiering.low_confidence_spans(segments, 10200, threshold=0.6) == [(0, 3500), (8500, 10200)]
+
+def test_merge_refined_drops_overlap_with_kept_neighbours():
+    segments = [{'start': 0, 'end': 5000, 'text': 'a'}, {'start': 5000, 'end': 10000, 'text': 'b'},
+                {'start': 10000, 'end': 15000, 'text': 'c'}]
+    refined = [[{'start': 0, 'end': 3000, 'text': 'B1'}, {'start': 3000, 'end': 8000, 'text': 'B2'}]]
+    merged = tiering.merge_refined(segments, [(4500, 10500)], refined)
+    assert [s['text'] for s in merged] == ['a', 'B1', 'B2', 'c']
+    assert [(s['start'], s['end']) for s in merged] == [(0, 5000), (5000, 7500), (7500, 10500), (10500, 15000)]
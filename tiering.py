@@ -0,0 +1,57 @@
+from typing import Dict, List, Tuple
+from config import TIER_CONFIDENCE_THRESHOLD
+
+# Re-transcribed spans get this much extra audio on either side for context (ms)
+SPAN_PADDING_MS = 500
+
+# Low-confidence segments closer together than this are re-run as one span (ms)
+SPAN_MERGE_GAP_MS = 2000
+
+# A span is (start_ms, end_ms) on the audio timeline
+Span = Tuple[int, int]
+
+def is_low_confidence(segment: Dict, threshold: float = TIER_CONFIDENCE_THRESHOLD) -> bool:
+    """Segments without a reported confidence are trusted."""
+    return segment.get('confidence', 1.0) < threshold
+
+def low_confidence_spans(segments: List[Dict], duration_ms: int,
+                         threshold: float = TIER_CONFIDENCE_THRESHOLD) -> List[Span]:
+    """Padded spans covering the low-confidence segments, with nearby ones merged."""
+    spans = []
+    for segment in segments:
+        if not is_low_confidence(segment, threshold):
+            continue
+        start = max(0, segment['start'] - SPAN_PADDING_MS)
+        end = min(duration_ms, segment['end'] + SPAN_PADDING_MS)
+        if spans and start - spans[-1][1] <= SPAN_MERGE_GAP_MS:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+def merge_refined(segments: List[Dict], spans: List[Span],
+                  span_segments: List[List[Dict]]) -> List[Dict]:
+    """
+    Replace the fast-model segments inside each span with the segments from the larger
+    model. span_segments hold timestamps relative to the start of their span.
+    """
+    def in_span(segment: Dict) -> bool:
+        midpoint = (segment['start'] + segment['end']) / 2
+        return any(start <= midpoint < end for start, end in spans)
+    
+    merged = [segment for segment in segments if not in_span(segment)]
+    for (start, end), refined in zip(spans, span_segments):
+        for segment in refined:
+            shifted = dict(segment, start=segment['start'] + start, end=min(segment['end'] + start, end))
+            if shifted['start'] < end:
+                merged.append(shifted)
+    merged.sort(key=lambda segment: segment['start'])
+    
+    # The padding can make refined segments overlap their kept neighbours
+    result = []
+    for segment in merged:
+        if result and segment['start'] < result[-1]['end']:
+            segment = dict(segment, start=result[-1]['end'])
+        if segment['start'] < segment['end']:
+            result.append(segment)
+    return result
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Content-addressed transcript cache.
+Segments are stored under a hash of the audio bytes plus the model and whisper options,
+so moved, renamed or duplicated files are never transcribed twice.
+Usage: python transcript_cache.py {stats,list,prune,clear}
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from config import TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_MAX_MB
+
+HASH_CHUNK_SIZE = 1024 * 1024
+MAX_MEMOIZED_HASHES = 10000
+
+class TranscriptCache:
+    """On-disk cache of segment lists with size-bounded LRU eviction (by entry mtime)."""
+    
+    def __init__(self, cache_dir: Path = TRANSCRIPT_CACHE_DIR,
+                 max_bytes: int = TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Total size of entries, computed on first write
+        self._hashes: Dict[Tuple[str, int, int], str] = {}  # (path, size, mtime) -> audio hash
+    
+    def audio_hash(self, audio_path: Path) -> str:
+        """SHA-256 of the audio file contents (memoized per path, size and mtime)."""
+        st = audio_path.stat()
+        memo_key = (str(audio_path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._hashes:
+                return self._hashes[memo_key]
+        
+        digest = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        
+        with self._lock:
+            if len(self._hashes) >= MAX_MEMOIZED_HASHES:
+                self._hashes.clear()  # Keep memory bounded in long-running processes
+            self._hashes[memo_key] = digest.hexdigest()
+        return digest.hexdigest()
+    
+    def key(self, audio_path: Path, model: Path, options: Dict) -> str:
+        """Cache key for an audio file transcribed with the given model and options."""
+        material = json.dumps({
+            'audio': self.audio_hash(audio_path),
+            'model': str(model),
+            'options': options,
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+    
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Return the cached segments for key, or None on a miss."""
+        path = self.entry_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            return None
+        return entry['segments']
+    
+    def put(self, key: str, segments: List[Dict], source: Path, model: Path, options: Dict):
+        """Store segments for key and evict least recently used entries if over budget."""
+        path = self.entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            'key': key,
+            'source': str(source),
+            'model': str(model),
+            'options': options,
+            'created': time.time(),
+            'segments': segments,
+        }
+        
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        old_size = path.stat().st_size if path.exists() else 0
+        os.replace(tmp_path, path)
+        
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self.entries())
+            else:
+                self._size += path.stat().st_size - old_size
+            over_budget = self._size > self.max_bytes
+        
+        if over_budget:
+            self.prune()
+    
+    def entries(self) -> List[Tuple[Path, int, float]]:
+        """List cache entries as (path, size, last_used), least recently used first."""
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        entries.sort(key=lambda e: e[2])
+        return entries
+    
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """Evict least recently used entries until the cache fits. Returns (removed, freed_bytes)."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        
+        for path, size, _ in entries:
+            if total <= limit:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            freed += size
+        
+        with self._lock:
+            self._size = total
+        return removed, freed
+    
+    def clear(self) -> Tuple[int, int]:
+        """Remove every entry. Returns (removed, freed_bytes)."""
+        return self.prune(max_bytes=0)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> TranscriptCache:
+    """Get the shared transcript cache (created on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache()
+        return _cache
+
+def format_size(num_bytes: int) -> str:
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the WhispSub transcript cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show entry count and size")
+    list_parser = subparsers.add_parser("list", help="List entries, most recently used first")
+    list_parser.add_argument("-n", type=int, default=20, help="Number of entries to show")
+    prune_parser = subparsers.add_parser("prune", help="Evict least recently used entries")
+    prune_parser.add_argument("--max-mb", type=float, default=TRANSCRIPT_CACHE_MAX_MB,
+                              help="Size to prune down to (default: configured limit)")
+    subparsers.add_parser("clear", help="Remove all entries")
+    args = parser.parse_args()
+    
+    cache = get_cache()
+    
+    if args.command == "stats":
+        entries = cache.entries()
+        total = sum(size for _, size, _ in entries)
+        print(f"📦 Cache: {cache.cache_dir}")
+        print(f"   Entries: {len(entries)}")
+        print(f"   Size: {format_size(total)} / {format_size(cache.max_bytes)}")
+    elif args.command == "list":
+        for path, size, last_used in reversed(cache.entries()[-args.n:]):
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used))
+            print(f"{entry['key'][:12]}  {used}  {len(entry['segments']):5d} segments  {entry['source']}")
+    elif args.command == "prune":
+        removed, freed = cache.prune(int(args.max_mb * 1024 * 1024))
+        print(f"🧹 Removed {removed} entries ({format_size(freed)})")
+    elif args.command == "clear":
+        removed, freed = cache.clear()
+        print(f"🧹 Removed {removed} entries ({format_size(freed)})")
+
+if __name__ == "__main__":
+    main()
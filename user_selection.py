@@ -1,24 +1,20 @@
 import questionary
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple, Union
 from config import MUSIC_DIR
-from file_utils import list_folders, list_mp3_files_with_subtitle_info, extract_mp3_filename
+from file_utils import list_folders, list_mp3_files, list_mp3_files_with_subtitle_info, extract_mp3_filename
 from subtitle_checker import display_subtitle_status
+from subtitle_writer import SUBTITLE_FORMATS
 
-import questionary
-from pathlib import Path
-from typing import Optional, Tuple, Union
-from config import MUSIC_DIR
-from file_utils import list_folders, list_mp3_files_with_subtitle_info, extract_mp3_filename
-from subtitle_checker import display_subtitle_status
+THIS_FOLDER = "📂 (use this folder)"
 
 def select_processing_mode() -> str:
     """Choose between single file or batch processing."""
     mode = questionary.select(
         "Choose processing mode:",
         choices=[
-            "Process single MP3 file",
-            "Process all MP3 files in folder (batch mode)"
+            "Process single audio file",
+            "Process all audio files in folder (batch mode)"
         ]
     ).ask()
     
@@ -29,10 +25,10 @@ def select_processing_mode() -> str:
     else:
         return 'batch'
 
-def select_music_file() -> Optional[Tuple[Path, str, str]]:
+def select_music_file() -> Optional[Tuple[Path, List[str], str]]:
     """
-    Interactive selection of music file(s) and subtitle format.
-    Returns tuple of (mp3_path_or_folder, subtitle_format, processing_mode) or None if cancelled.
+    Interactive selection of music file(s) and subtitle formats.
+    Returns tuple of (mp3_path_or_folder, subtitle_formats, processing_mode) or None if cancelled.
     """
     # Step 0: Choose processing mode
     processing_mode = select_processing_mode()
@@ -55,31 +51,37 @@ def select_music_file() -> Optional[Tuple[Path, str, str]]:
     
     folder_path = MUSIC_DIR / selected_folder
 
-    # Step 2: Choose Subfolder (if available)
-    subfolders = list_folders(folder_path)
-    if subfolders:
+    # Step 2: Choose Subfolders (as deep as the library goes)
+    subfolder_path = folder_path
+    subfolders = list_folders(subfolder_path)
+    while subfolders:
+        choices = subfolders
+        if list_mp3_files(subfolder_path):
+            choices = [THIS_FOLDER] + subfolders
+        
         selected_subfolder = questionary.select(
-            f"Choose a subfolder in {selected_folder}:",
-            choices=subfolders
+            f"Choose a subfolder in {subfolder_path.relative_to(MUSIC_DIR)}:",
+            choices=choices
         ).ask()
         
         if not selected_subfolder:
             return None
+        if selected_subfolder == THIS_FOLDER:
+            break
             
-        subfolder_path = folder_path / selected_subfolder
-    else:
-        subfolder_path = folder_path
+        subfolder_path = subfolder_path / selected_subfolder
+        subfolders = list_folders(subfolder_path)
 
     # Step 3: Handle single file vs batch mode
     if processing_mode == 'single':
         # Single file selection
         mp3_files_with_info = list_mp3_files_with_subtitle_info(subfolder_path)
         if not mp3_files_with_info:
-            print("No MP3 files in that folder.")
+            print("No audio files in that folder.")
             return None
 
         selected_mp3_display = questionary.select(
-            "Choose an MP3 file (existing subtitles shown in brackets):",
+            "Choose an audio file (existing subtitles shown in brackets):",
             choices=mp3_files_with_info
         ).ask()
         
@@ -97,24 +99,27 @@ def select_music_file() -> Optional[Tuple[Path, str, str]]:
         target_path = mp3_path
     else:
         # Batch mode - use the folder path
-        from file_utils import list_mp3_files
         mp3_count = len(list_mp3_files(subfolder_path))
         if mp3_count == 0:
-            print("No MP3 files in that folder.")
+            print("No audio files in that folder.")
             return None
         
         print(f"\n📁 Selected folder: {subfolder_path}")
-        print(f"🎵 Found {mp3_count} MP3 files for batch processing")
+        print(f"🎵 Found {mp3_count} audio files for batch processing")
         
         target_path = subfolder_path
 
-    # Step 4: Choose Subtitle Format
-    subtitle_format = questionary.select(
-        "Choose subtitle format to generate:",
-        choices=["srt", "lrc"]
+    # Step 4: Choose Subtitle Formats (all rendered from one transcription)
+    subtitle_formats = questionary.checkbox(
+        "Choose subtitle formats to generate:",
+        choices=[
+            questionary.Choice(fmt, checked=(fmt == "srt"))
+            for fmt in SUBTITLE_FORMATS
+        ],
+        validate=lambda selected: bool(selected) or "Select at least one format"
     ).ask()
     
-    if not subtitle_format:
+    if not subtitle_formats:
         return None
 
-    return target_path, subtitle_format, processing_mode
\ No newline at end of file
+    return target_path, subtitle_formats, processing_mode
\ No newline at end of file
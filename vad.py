@@ -0,0 +1,114 @@
+import io
+import wave
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+from config import VAD_THRESHOLD_DB, VAD_MIN_SILENCE_MS, VAD_PADDING_MS
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# The noise-floor threshold (10th percentile level + 10 dB) is capped at threshold_db
+# plus this much, so audio at a steady level (music beds, compressed narration) still
+# counts as speech
+MAX_RELATIVE_DB = 20.0
+
+# A region maps part of the trimmed audio back to the original timeline:
+# (trimmed_start_ms, original_start_ms, length_ms)
+Region = Tuple[int, int, int]
+
+def pcm_to_samples(pcm: bytes) -> np.ndarray:
+    """View raw 16-bit PCM bytes as an int16 array."""
+    return np.frombuffer(pcm, dtype=np.int16)
+
+def read_wav(wav_path: Path) -> np.ndarray:
+    """Read a 16 kHz mono 16-bit WAV into an int16 array."""
+    with wave.open(str(wav_path), "rb") as f:
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    """Encode int16 samples as a 16 kHz mono WAV."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+def frame_energy_db(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS level of each frame in dBFS."""
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-10))
+
+def detect_speech(samples: np.ndarray, threshold_db: float = VAD_THRESHOLD_DB,
+                  min_silence_ms: int = VAD_MIN_SILENCE_MS,
+                  padding_ms: int = VAD_PADDING_MS) -> List[Tuple[int, int]]:
+    """
+    Find speech regions as (start_sample, end_sample) pairs.
+    A frame is speech if it is louder than both threshold_db and the noise floor
+    (10th percentile level) plus 10 dB, capped at MAX_RELATIVE_DB above threshold_db.
+    Pauses shorter than min_silence_ms are bridged. Audio with frames above threshold_db
+    never comes back empty: if none stands out from the noise floor, it is all speech.
+    """
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    if len(samples) < frame_len:
+        return [(0, len(samples))] if len(samples) else []
+    
+    energy = frame_energy_db(samples, frame_len)
+    relative = min(np.percentile(energy, 10) + 10.0, threshold_db + MAX_RELATIVE_DB)
+    voiced = energy > max(threshold_db, relative)
+    if not voiced.any():
+        return [(0, len(samples))] if (energy > threshold_db).any() else []
+    
+    # Rising/falling edges of the voiced mask give region boundaries (in frames)
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    
+    # Bridge short pauses, then pad and convert to samples
+    max_gap = min_silence_ms // FRAME_MS
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] > max_gap))
+    starts = starts[keep]
+    ends = np.concatenate((ends[np.flatnonzero(keep)[1:] - 1], [ends[-1]]))
+    
+    padding = padding_ms * SAMPLE_RATE // 1000
+    regions = []
+    for start, end in zip(starts * frame_len - padding, ends * frame_len + padding):
+        start, end = max(0, int(start)), min(len(samples), int(end))
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)  # Padding made them overlap
+        else:
+            regions.append((start, end))
+    return regions
+
+def trim_silence(samples: np.ndarray, speech: List[Tuple[int, int]]) -> Tuple[np.ndarray, List[Region]]:
+    """Concatenate the speech regions. Returns the trimmed audio and its region map."""
+    regions = []
+    trimmed = 0  # Samples so far; offsets come from this total so rounding doesn't add up
+    for start, end in speech:
+        trimmed_ms = trimmed * 1000 // SAMPLE_RATE
+        trimmed += end - start
+        regions.append((trimmed_ms, start * 1000 // SAMPLE_RATE, trimmed * 1000 // SAMPLE_RATE - trimmed_ms))
+    
+    if not speech:
+        return samples[:0], regions
+    return np.concatenate([samples[start:end] for start, end in speech]), regions
+
+def to_original_time(ms: int, regions: List[Region]) -> int:
+    """Map a time on the trimmed timeline back to the original audio."""
+    for trimmed_start, original_start, length in reversed(regions):
+        if ms >= trimmed_start:
+            return original_start + min(ms - trimmed_start, length)
+    return ms
+
+def remap_segments(segments: List[Dict], regions: List[Region]) -> List[Dict]:
+    """Shift segment timestamps from the trimmed timeline back to the original one."""
+    return [
+        dict(segment,
+             start=to_original_time(segment['start'], regions),
+             end=to_original_time(segment['end'], regions))
+        for segment in segments
+    ]
@@ -0,0 +1,300 @@
+import ctypes
+import ctypes.util
+import itertools
+import os
+import queue
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from config import WATCH_DEBOUNCE_SECONDS, WATCH_POLL_SECONDS, WATCH_QUEUE_SIZE
+from library_index import AUDIO_EXTENSIONS, get_index
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+def is_audio(path: Path) -> bool:
+    return path.suffix.lower() in AUDIO_EXTENSIONS and not path.name.startswith(".")
+
+class PollingWatcher:
+    """
+    Fallback watcher: every poll interval, stats each directory once and re-lists only
+    directories whose mtime changed (through the library index). Detects new and
+    renamed files; files rewritten in place are only seen with inotify.
+    """
+    
+    def __init__(self, roots: List[Path], interval: float = WATCH_POLL_SECONDS):
+        self.roots = roots
+        self.interval = interval
+        self.index = get_index()
+        self.known: Dict[str, Set[str]] = {}
+        self._poll(report=False)
+    
+    def _poll(self, report: bool = True) -> List[Path]:
+        changed = []
+        seen_dirs = set()
+        for root in self.roots:
+            for directory in self._directories(root):
+                key = str(directory)
+                seen_dirs.add(key)
+                audio = set(self.index.list_audio_files(directory))
+                if report:
+                    changed.extend(directory / name for name in audio - self.known.get(key, set()))
+                self.known[key] = audio
+        for key in set(self.known) - seen_dirs:
+            del self.known[key]  # Directory was removed
+        self.index.save()
+        return changed
+    
+    def _directories(self, root: Path):
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            yield directory
+            stack.extend(directory / name for name in self.index.list_folders(directory))
+    
+    def changes(self, timeout: float) -> List[Path]:
+        time.sleep(min(timeout, self.interval))
+        return self._poll()
+    
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """Linux watcher: one inotify watch per directory, added as new directories appear."""
+    
+    def __init__(self, roots: List[Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.watches: Dict[int, Path] = {}
+        for root in roots:
+            self._watch_tree(root)
+    
+    def _watch_tree(self, root: Path) -> List[Path]:
+        """Watch root and every directory below it. Returns the audio files found."""
+        audio = []
+        stack = [root]
+        index = get_index()
+        while stack:
+            directory = stack.pop()
+            wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                print(f"⚠️  Cannot watch {directory}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self.watches[wd] = directory
+            audio.extend(directory / name for name in index.list_audio_files(directory))
+            stack.extend(directory / name for name in index.list_folders(directory))
+        return audio
+    
+    def changes(self, timeout: float) -> List[Path]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: re-register everything (unchanged directories are cheap)
+                for root in self.roots:
+                    changed.extend(self._watch_tree(root))
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.extend(self._watch_tree(path))
+            elif is_audio(path):
+                changed.append(path)
+        return changed
+    
+    def close(self):
+        os.close(self.fd)
+
+def create_watcher(roots: List[Path], polling: bool = False):
+    """Use inotify where available, otherwise fall back to polling."""
+    if not polling:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(roots)
+
+class WatchDaemon:
+    """
+    Watches directories and transcribes new or changed audio files once they stop changing.
+    Settled files go into a bounded priority queue (smallest files first, so short uploads
+    get subtitles quickly) that feeds a pool of worker threads.
+    """
+    
+    def __init__(self, roots: List[Path], subtitle_formats: List[str], workers: int = 1,
+                 debounce: float = WATCH_DEBOUNCE_SECONDS, polling: bool = False,
+                 queue_size: int = WATCH_QUEUE_SIZE, initial_scan: bool = False):
+        self.roots = roots
+        self.subtitle_formats = subtitle_formats
+        self.workers = max(1, workers)
+        self.debounce = debounce
+        self.polling = polling
+        self.initial_scan = initial_scan
+        self.queue: "queue.PriorityQueue[Tuple[int, int, Path]]" = queue.PriorityQueue(maxsize=queue_size)
+        self.pending: Dict[Path, Tuple[int, int, float]] = {}  # path -> (size, mtime_ns, last change)
+        self.ready: Dict[Path, int] = {}                       # settled, waiting for queue space
+        self.queued: Set[Path] = set()
+        self.stats = {'processed': 0, 'failed': 0, 'skipped': 0}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def note_change(self, path: Path):
+        """Start (or restart) the debounce timer of a file."""
+        try:
+            st = path.stat()
+        except OSError:
+            self.pending.pop(path, None)
+            return
+        self.pending[path] = (st.st_size, st.st_mtime_ns, time.monotonic())
+    
+    def settle(self):
+        """Move files that stayed unchanged for the debounce period to the ready set."""
+        now = time.monotonic()
+        for path, (size, mtime_ns, changed_at) in list(self.pending.items()):
+            try:
+                st = path.stat()
+            except OSError:
+                del self.pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - changed_at >= self.debounce:
+                del self.pending[path]
+                self.ready[path] = st.st_size
+    
+    def enqueue_ready(self):
+        """Feed settled files into the bounded queue, leaving the rest for later."""
+        for path, size in sorted(self.ready.items(), key=lambda item: item[1]):
+            with self._lock:
+                if path in self.queued:
+                    continue  # Re-queue once the running job for it has finished
+            try:
+                self.queue.put_nowait((size, next(self._counter), path))
+            except queue.Full:
+                return
+            with self._lock:
+                self.queued.add(path)
+            del self.ready[path]
+    
+    def needs_subtitles(self, path: Path) -> bool:
+        """A file needs work unless every requested subtitle exists and is newer than the audio."""
+        from subtitle_writer import subtitle_path
+        try:
+            audio_mtime = path.stat().st_mtime
+            return any(
+                not subtitle_path(path, fmt).exists() or subtitle_path(path, fmt).stat().st_mtime < audio_mtime
+                for fmt in self.subtitle_formats
+            )
+        except OSError:
+            return False
+    
+    def worker(self, threads: int):
+        from audio_processor import generate_subtitles
+        from metrics import get_metrics
+        from subtitle_writer import subtitle_path
+        
+        while not self._stop.is_set():
+            try:
+                _, _, path = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            try:
+                if not self.needs_subtitles(path):
+                    outcome = 'skipped'
+                else:
+                    print(f"🎧 Transcribing {path}")
+                    existing = any(subtitle_path(path, fmt).exists() for fmt in self.subtitle_formats)
+                    ok = generate_subtitles(path, self.subtitle_formats, threads=threads,
+                                            action='overwrite' if existing else 'proceed')
+                    outcome = 'processed' if ok else 'failed'
+            except Exception as e:
+                print(f"❌ Error processing {path}: {e}")
+                outcome = 'failed'
+            finally:
+                with self._lock:
+                    self.queued.discard(path)
+                get_metrics().discard(path)  # Keep memory flat over long uptimes
+                self.queue.task_done()
+            
+            with self._lock:
+                self.stats[outcome] += 1
+            if outcome != 'skipped':
+                print(f"   {'✅' if outcome == 'processed' else '❌'} {path.name} "
+                      f"({self.stats['processed']} done, {self.stats['failed']} failed)")
+    
+    def run(self):
+        """Watch until stop() is called (or Ctrl-C)."""
+        from process_runner import get_runner
+        
+        watcher = create_watcher(self.roots, self.polling)
+        get_runner().allow_transcribers(self.workers)  # Cores are split between all workers
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        pool = [threading.Thread(target=self.worker, args=(threads,), daemon=True) for _ in range(self.workers)]
+        for thread in pool:
+            thread.start()
+        
+        if self.initial_scan:
+            index = get_index()
+            for root in self.roots:
+                for path in index.walk_audio_files(root):
+                    if self.needs_subtitles(path):
+                        self.ready[path] = path.stat().st_size
+        
+        kind = "inotify" if isinstance(watcher, InotifyWatcher) else "polling"
+        print(f"👀 Watching {', '.join(str(r) for r in self.roots)} ({kind}, {self.workers} workers)")
+        try:
+            while not self._stop.is_set():
+                # Wake up often enough to settle pending files on time
+                timeout = min(1.0, self.debounce) if self.pending or self.ready else 5.0
+                for path in watcher.changes(timeout):
+                    self.note_change(path)
+                self.settle()
+                self.enqueue_ready()
+        finally:
+            self._stop.set()
+            watcher.close()
+            for thread in pool:
+                thread.join()